@@ -1,179 +1,862 @@
 import random
-
-# tables inspired from https://www.chessprogramming.org/Simplified_Evaluation_Function
-# Negative value are an interesting twist.
-
-kingScores =  [[+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00],
-                [+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00],
-                [+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00],
-                [+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00],
-                [+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00],
-                [+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00],
-                [+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00],
-                [+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00]]
-
-queenScores =  [[-0.20,-0.10,-0.10,-0.05,-0.05,-0.10,-0.10,-0.20],
-                [-0.10,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,-0.10],
-                [-0.10,+0.00,+0.05,+0.05,+0.05,+0.05,+0.00,-0.10],
-                [-0.50,+0.00,+0.05,+0.05,+0.05,+0.05,+0.00,-0.05],
-                [+0.00,+0.00,+0.05,+0.05,+0.05,+0.05,+0.00,-0.05],
-                [-0.10,+0.05,+0.05,+0.05,+0.05,+0.05,+0.00,-0.10],
-                [-0.10,+0.00,+0.05,+0.00,+0.00,+0.00,+0.00,-0.10],
-                [-0.20,-0.10,-0.10,-0.05,-0.05,-0.10,-0.10,-0.20]]
-
-rookScores =   [[+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00],
-                [+0.05,+0.10,+0.10,+0.10,+0.10,+0.10,+0.10,+0.05],
-                [-0.05,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,-0.05],
-                [-0.05,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,-0.05],
-                [-0.05,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,-0.05],
-                [-0.05,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,-0.05],
-                [-0.05,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,-0.05],
-                [-0.00,+0.00,+0.00,+0.05,+0.05,+0.00,+0.00,-0.00]]
-
-bishopScores = [[-0.20,-0.10,-0.10,-0.10,-0.10,-0.10,-0.10,-0.20],
-                [-0.10,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,-0.10],
-                [-0.10,+0.00,+0.05,+0.10,+0.10,+0.05,+0.00,-0.10],
-                [-0.10,+0.05,+0.05,+0.10,+0.10,+0.05,+0.05,-0.10],
-                [-0.10,+0.00,+0.10,+0.10,+0.10,+0.10,+0.00,-0.10],
-                [-0.10,+0.10,+0.10,+0.10,+0.10,+0.10,+0.10,-0.10],
-                [-0.10,+0.05,+0.00,+0.00,+0.00,+0.00,+0.05,-0.10],
-                [-0.20,-0.10,-0.10,-0.10,-0.10,-0.10,-0.10,-0.20]]
-
-knightScores = [[-0.50,-0.40,-0.30,-0.30,-0.30,-0.30,-0.40,-0.50],
-                [-0.40,-0.20,+0.00,+0.00,+0.00,+0.00,-0.20,-0.40],
-                [-0.30,+0.00,+0.10,+0.15,+0.15,+0.10,+0.00,-0.30],
-                [-0.30,+0.05,+0.15,+0.20,+0.20,+0.15,+0.05,-0.30],
-                [-0.30,+0.00,+0.15,+0.20,+0.20,+0.15,+0.00,-0.30],
-                [-0.30,+0.05,+0.10,+0.15,+0.15,+0.10,+0.05,-0.30],
-                [-0.40,-0.20,+0.00,+0.05,+0.05,+0.00,-0.20,-0.40],
-                [-0.50,-0.40,-0.30,-0.30,-0.30,-0.30,-0.40,-0.50]]
-
-PawnScores =   [[+9.00,+9.00,+9.00,+9.00,+9.00,+9.00,+9.00,+9.00],
-                [+0.80,+0.80,+0.80,+0.80,+0.80,+0.80,+0.80,+0.80],
-                [+0.35,+0.50,+0.50,+0.50,+0.50,+0.50,+0.50,+0.35],
-                [+0.15,+0.25,+0.30,+0.45,+0.45,+0.30,+0.25,+0.15],
-                [+0.10,+0.20,+0.20,+0.40,+0.40,+0.20,+0.20,+0.10],
-                [+0.15,+0.00,-0.10,+0.10,+0.10,-0.10,+0.00,+0.15],
-                [+0.05,+0.10,+0.00,-0.20,-0.20,+0.10,+0.10,+0.05],
-                [+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00]]
-
-
-piecePositionScores = {"wK": kingScores, "bK": kingScores[::-1], 
-                       "wQ": queenScores, "bQ": queenScores[::-1], 
-                       "wR": rookScores,"bR": rookScores[::-1], 
-                       "wB": bishopScores, "bB": bishopScores[::-1],
-                       "wN": knightScores, "bN": knightScores[::-1],
-                       "wP": PawnScores, "bP": PawnScores[::-1]}
-
-pieceScore = {"K": 0, "Q": 9, "R": 5, "B": 3, "N": 3, "P": 1}
-CHECKMATE = 1000
+import ast
+import time
+import math
+import os
+import multiprocessing
+import atexit
+import threading
+import ChessTranspositionTable as ChessTT
+import ChessMoveOrdering
+import ChessTrace
+from ChessEvaluation import pieceScore
+from ChessEngine import MOVE_CAPTURE, MOVE_PROMOTION
+
+CHECKMATE = 1000             # Mate scores are CHECKMATE - the ply of the mate from the root: faster mates score higher
 STALEMATE = 0
+DRAW = 0
 MAXDEPTH = 4
 positionsScored = 0
-searchTreeExportEnable = True # Triggers codes for searchTree export. Requires extra external library openpyxl
-searchTree = None
+nodesSearched = 0
+useIterativeDeepening = True # Search depth 1, 2, 3... until the budget below runs out instead of MAXDEPTH only.
+searchTimeLimit = 3.0        # Seconds per move for iterative deepening. 0 means no time limit.
+searchNodeLimit = 0          # Nodes per move for iterative deepening. 0 means no node limit.
+maxIterativeDepth = 32       # Deepest iteration, reached only in very simple positions.
+searchDepth = MAXDEPTH       # Depth of the current (root) search.
+searchDeadline = None        # time.time() when the search has to stop. None when not limited.
+searchStartTime = 0          # time.time() when the search started, pondering included
+searchNodeBudget = 0         # nodesSearched when the search has to stop. 0 when not limited.
+previousPV = []              # Best line of the last completed iteration (moveIDs), searched first by the next one.
+MAX_PLY = ChessMoveOrdering.MAX_PLY
+pvTable = [[None] * (MAX_PLY - ply) for ply in range(MAX_PLY)] # Triangular: row ply is the best line from ply on
+pvLength = [0] * MAX_PLY     # Number of moves in each row of pvTable
+useTranspositionTable = True # Remember searched positions (see ChessTranspositionTable)
+transpositionTableMB = 16    # Memory used by the transposition table
+transpositionTable = ChessTT.TranspositionTable(transpositionTableMB) if useTranspositionTable else None
+useMoveOrdering = True       # Sort moves before searching them (see ChessMoveOrdering)
+moveOrdering = ChessMoveOrdering.MoveOrdering() # Any object with newSearch/orderMoves/recordCutoff/statistics
+useQuiescenceSearch = True   # Extend leaves with captures and promotions until the position is quiet
+maxQuiescenceDepth = 10      # Safety limit on the length of the capture sequences
+DELTA_MARGIN = 2             # Delta pruning: skip captures that cannot raise alpha even with this bonus
+usePseudoLegalMoves = True   # Generate pseudo-legal moves and only test the legality of the moves actually searched
+useStagedMoveGeneration = True # Generate hash move, captures, killers, quiets one stage at a time (needs usePseudoLegalMoves)
+usePVS = True                # Principal Variation Search: null window for every move after the first, see NegaMax
+useAspirationWindows = True  # Iterative deepening: search around the previous iteration's score first
+ASPIRATION_WINDOW = 0.5      # Half width of the first aspiration window, in pawns. Doubled on each fail low/high.
+NULL_WINDOW = 0.01           # Smallest score difference: scores are whole centipawns (see scoreBoard)
+# Selectivity: the options below are off until a ChessMatch run shows they play stronger.
+useNullMovePruning = False   # Skip nodes where passing the turn still fails high, see NegaMax
+useNullMoveVerification = False # Confirm each null-move cutoff with a reduced search of the real moves (zugzwang)
+NULL_MOVE_REDUCTION = 2      # The null move is searched this much shallower (one more above depth 6)
+NULL_MOVE_MIN_DEPTH = 3      # No null move closer to the leaves than this
+useLateMoveReductions = False # Search the late quiet moves shallower, again at full depth if they beat alpha
+LMR_MIN_DEPTH = 3            # No reductions closer to the leaves than this
+LMR_MIN_MOVES = 3            # The first moves of a node are never reduced
+useFutilityPruning = False   # Near the leaves, skip the quiet moves when the score is far below alpha
+FUTILITY_MARGINS = (0, 2.0, 3.5) # by depth left, in pawns: the most a quiet move is expected to gain
+useReverseFutilityPruning = False # Near the leaves, return when the score is far above beta
+REVERSE_FUTILITY_DEPTH = 3   # Deepest node where reverse futility pruning is tried
+REVERSE_FUTILITY_MARGIN = 1.2 # per depth left, in pawns
+useRepetitionDetection = True # A position repeated in the search or from the game is scored as a draw
+searchCounters = {}          # Statistics of the last search (re-searches, prunings...), for the bench, see newSearchCounters
+parallelWorkers = 0          # > 1: split the root moves over this many worker processes (see parallelRootSearch)
+workerPool = None            # Persistent multiprocessing.Pool, created by the first parallel search
+workerTableUsage = None      # Fullest worker transposition table after a parallelRootSearch, for the search summary
+sharedAlpha = None           # Best root score of the current iteration, shared with the workers (multiprocessing.Value)
+useLazySMP = False           # With parallelWorkers > 1: all workers search the whole root, sharing one transposition table
+stopSearch = None            # Set to 1 to stop the workers (multiprocessing.Value), checked with the search limits
+ROOT_POLL_INTERVAL = 0.01    # Seconds between the deadline checks of parallelRootSearch while it waits for a worker
+pondering = False            # Searching on the opponent's time: no time or node limit until ponderHit()
+ponderLock = threading.Lock() # ponderHit() runs in another thread than the search (see ChessWorker)
+bestLine = []                # Best line of the last findBestMove (Move objects). bestLine[1] is the expected reply.
+multiPV = 1                  # Number of best root moves searched with their own line (not with parallelRootSearch)
+searchInfo = None            # Called with (depth, [(score, line)]) after each completed iteration (see ChessUCI)
+showSearchSummary = True     # Print the summary of each search to the terminal
+searchTracer = ChessTrace.SearchTracer() # Observer of the search tree, e.g. the Excel export. See setSearchTracer
+tracing = False              # True when a tracer is installed. The search only calls searchTracer when it is set.
+
+def setSearchTracer(tracer=None):
+    """ 
+    Installs an observer of the search tree (see ChessTrace), or the no-op default with None.
+    For example setSearchTracer(ChessTrace.excelTracer(MAXDEPTH)) exports every search to an Excel file.
+    """
+
+    global searchTracer, tracing
+    searchTracer = tracer if tracer is not None else ChessTrace.SearchTracer()
+    tracing = tracer is not None
+
+def parseSetting(text):
+    """ 
+    "name=value" -> (name, value) for a setting of this module, e.g. "usePVS=False". The value is a Python literal.
+    Used by the command line tools (ChessBench, ChessMatch). Raises ValueError for an unknown setting.
+    """
+
+    name, value = text.split("=", 1)
+    name = name.strip()
+    if name not in globals():
+        raise ValueError(f"unknown ChessAI setting: {name}")
+    return name, ast.literal_eval(value.strip())
+
+def newGame():
+    """ Forgets what was learned in the previous game: transposition table, killers and history. """
 
-if searchTreeExportEnable: 
-    # The export code requires the openpyxl library. https://openpyxl.readthedocs.io
-    import ChessTree2Excel as ChessXL # this will enable exporting the searchTree in an Excel file for easy reading.
-    searchTree = ChessXL.searchTree(MAXDEPTH)
+    global moveOrdering
+    if transpositionTable is not None:
+        transpositionTable.clear()
+    moveOrdering = ChessMoveOrdering.MoveOrdering()
 
 def findRandomMove(validMoves):
     """ Returns a random move. """
 
     return validMoves[random.randint(0, len(validMoves)-1)]
 
+def newSearchCounters():
+    """ Resets searchCounters. """
+
+    global searchCounters
+    searchCounters = {"pvsResearches": 0, "aspirationResearches": 0, "nullMoveCutoffs": 0, "nullMoveVerifications": 0,
+                      "lateMoveReductions": 0, "lmrResearches": 0, "futilityPrunes": 0, "reverseFutilityPrunes": 0,
+                      "repetitionDraws": 0}
+
 def findBestMove(gs, validMoves, returnQueue):
-    """ Helper method to make 1st recursive call """
+    """ 
+    Helper method to make 1st recursive call. validMoves and the move put in returnQueue are Move objects,
+    the search itself works on moveIDs (see GameState.makeMoveID).
+    """
 
-    global positionsScored
+    global positionsScored, nodesSearched, searchDepth, searchDeadline, searchNodeBudget, previousPV, bestLine
+    global workerTableUsage
     positionsScored = 0
+    nodesSearched = 0
+    workerTableUsage = None
+    newSearchCounters()
+    startTime = time.time()
 
-    if searchTreeExportEnable:
-        global currentBestMove # used to display temporary best move across unrelated branches.
-        currentBestMove = None
+    if tracing:
+        searchTracer.newSearch(gs)
     
-    random.shuffle(validMoves) # introduces variety, also allows diffent moves if you undo
-
-    finalScore, finalSeq = NegaMaxAlphaBeta(gs, 
-                                  validMoves, 
-                                  MAXDEPTH, 
-                                  -CHECKMATE - (MAXDEPTH - 1), 
-                                  CHECKMATE + (MAXDEPTH - 1), 
-                                  1 if gs.whiteToMove else -1, 
-                                  [])
-    finalBestMove = finalSeq[0]    
+    random.shuffle(validMoves) # introduces variety, also allows diffent moves if you undo. Ordering keeps ties shuffled.
+    rootMoves = [move.moveID for move in validMoves]
+    if useMoveOrdering:
+        moveOrdering.newSearch()
+
+    if parallelWorkers > 1 and not tracing: # the tracer needs the whole tree in this process
+        if useLazySMP and useTranspositionTable:
+            finalScore, finalSeq = lazySMPSearch(gs, rootMoves)
+        else:
+            finalScore, finalSeq = parallelRootSearch(gs, rootMoves)
+    elif useIterativeDeepening:
+        finalScore, finalSeq = iterativeDeepening(gs, rootMoves)
+    else:
+        finalScore, finalSeq = fixedDepthSearch(gs, rootMoves)
+    bestLine = gs.lineToMoves(finalSeq)
+    finalBestMove = bestLine[0] if bestLine else None # None: stopped before the end (see ChessWorker)
     
     # print move summary to terminal
-    print("Move#" + str(len(gs.moveLog)// 2 + 1) + 
-          "," + ("White" if gs.whiteToMove else "Black") + 
-          ", Search Depth: " + str(MAXDEPTH) + 
-          ", Positions evaluated: " + f'{positionsScored:6}',
-          ", Move: ", f'{str(finalBestMove) : >4}',
-          ", Score: ", f'{round(finalScore,2):5}',
-          ", Best line:", [str(m) for m in finalSeq]
-         )
+    if showSearchSummary:
+        print("Move#" + str(len(gs.moveLog)// 2 + 1) + 
+              "," + ("White" if gs.whiteToMove else "Black") + 
+              ", Search Depth: " + str(searchDepth) + 
+              ", Positions evaluated: " + f'{positionsScored:6}',
+              ", Time: " + f'{time.time() - startTime:.2f}s',
+              ", Move: ", f'{str(finalBestMove) : >4}',
+              ", Score: ", f'{round(finalScore,2):5}',
+              (", TT hits: " + f'{transpositionTable.hits}/{transpositionTable.probes}' + 
+               f' ({transpositionTable.usage() if workerTableUsage is None else workerTableUsage:.0%} full)' 
+               if useTranspositionTable else ""),
+              ", Best line:", [str(m) for m in bestLine]
+             )
+        if useMoveOrdering:
+            print("    Move ordering: " + moveOrdering.statistics())
     
-    if searchTreeExportEnable:
-        searchTree.saveToExcel("Move#" + str(len(gs.moveLog)// 2 + 1))
+    if tracing:
+        searchTracer.searchDone(gs)
 
     returnQueue.put(finalBestMove)
 
-def NegaMaxAlphaBeta(gs, validMoves, depth, alpha, beta, evSign, moveSeq):
+def startSearchClock():
+    """ Sets the time and node budget of a search starting now. Not limited while pondering, see ponderHit. """
+
+    global searchDeadline, searchNodeBudget, searchStartTime
+    searchStartTime = time.time()
+    with ponderLock:
+        limited = useIterativeDeepening and not pondering
+        searchDeadline = time.time() + searchTimeLimit if limited and searchTimeLimit > 0 else None
+        searchNodeBudget = searchNodeLimit if limited and searchNodeLimit > 0 else 0
+
+def ponderHit():
     """ 
-    This is the NegaMax recursive tree searcher. See https://en.wikipedia.org/wiki/Negamax
+    The opponent played the expected move: the ponder search becomes a normal search of the position.
+    Its time and node budget count from the start of the search, pondering included, so a long ponder answers 
+    right away with the last completed iteration. Everything it searched so far is kept.
     """
 
-    if searchTreeExportEnable: 
-        global searchTree # only used for export to Excel 
-        global currentBestMove # in export to excel code to display current best move across unrelated branches.
+    global pondering, searchDeadline, searchNodeBudget
+    with ponderLock:
+        pondering = False
+        searchDeadline = searchStartTime + searchTimeLimit if useIterativeDeepening and searchTimeLimit > 0 else None
+        searchNodeBudget = searchNodeLimit if useIterativeDeepening and searchNodeLimit > 0 else 0
+        if (searchDeadline is not None and time.time() >= searchDeadline) or \
+            (searchNodeBudget and nodesSearched >= searchNodeBudget):
+            if stopSearch is not None:
+                stopSearch.value = 1 # also stops the workers of a parallel search, which got no deadline
+
+def iterativeDeepening(gs, validMoves, firstDepth=1):
+    """ 
+    Search to depth 1, 2, 3... until the time or node budget runs out. See https://www.chessprogramming.org/Iterative_Deepening
+    Returns the score and best line of the last iteration that completed. An interrupted iteration is thrown away.
+    With multiPV > 1 each iteration also searches the next best root moves, for searchInfo.
+    validMoves and the lines are moveIDs.
+    """
 
-    if depth == 0 or len(validMoves) == 0: # we have reached a leaf or a terminal node.
-        return ((evSign * scoreBoard(gs)) - (evSign * depth if gs.checkmate else 0)), moveSeq
+    global searchDepth, previousPV
+    startSearchClock()
+    previousPV = []
+    rootPly = gs.gamePly
+    depthLimit = min(maxIterativeDepth, MAX_PLY - 1) # the tables indexed by ply or depth have MAX_PLY rows
+    if tracing and searchTracer.maxDepth is not None: # e.g. the Excel export is sized for MAXDEPTH
+        depthLimit = min(depthLimit, searchTracer.maxDepth)
+    finalScore, finalSeq, completedDepth = 0, [], 0
+
+    for depth in range(firstDepth, depthLimit + 1):
+        searchDepth = depth
+        lines = []
+        try:
+            # MultiPV: search again without the root moves already found to get the next best line.
+            rootMoves = validMoves
+            while len(lines) < multiPV and rootMoves:
+                if useAspirationWindows and not lines and finalSeq and abs(finalScore) < CHECKMATE / 2:
+                    score = aspirationSearch(gs, rootMoves, depth, finalScore)
+                else:
+                    score = NegaMaxAlphaBeta(gs, rootMoves, depth, -CHECKMATE, CHECKMATE,
+                                             1 if gs.whiteToMove else -1)
+                seq = principalVariation(gs)
+                lines.append((score, seq))
+                rootMoves = [move for move in rootMoves if move != seq[0]]
+        except SearchTimeout:
+            # Unwind the moves the interrupted search left on the board.
+            while gs.gamePly > rootPly:
+                gs.undoMoveID()
+            break
 
-    maxScore = -2*CHECKMATE  # this is our negative infinity per the algorithm
-    bestSeq = moveSeq.copy()
+        score, seq = lines[0]
+        finalScore, finalSeq, completedDepth = score, seq, depth
+        previousPV = seq
+        if searchInfo is not None:
+            searchInfo(depth, [(score, gs.lineToMoves(seq)) for score, seq in lines])
 
-    for move in validMoves:
+        if abs(score) > CHECKMATE / 2: # Found a forced mate, searching deeper will not change it.
+            break
+        if searchDeadline is not None and time.time() - searchStartTime > searchTimeLimit / 2:
+            break # Half of the time is used. The next iteration takes several times longer, it would not complete.
 
-        # create the next potential game state for a child node
-        gs.makeMove(move)
+    searchDepth = completedDepth
+    return finalScore, finalSeq
+
+def aspirationSearch(gs, validMoves, depth, previousScore):
+    """ 
+    Searches the root with a narrow window around the score of the previous iteration, which cuts more.
+    A score outside the window is only a bound: the window is widened on that side and the root searched again.
+    See https://www.chessprogramming.org/Aspiration_Windows
+    """
+
+    evSign = 1 if gs.whiteToMove else -1
+    delta = ASPIRATION_WINDOW
+    alpha, beta = previousScore - delta, previousScore + delta
+    while True:
+        score = NegaMaxAlphaBeta(gs, validMoves, depth, alpha, beta, evSign)
+        if score <= alpha:
+            alpha = max(score - delta, -CHECKMATE)
+        elif score >= beta:
+            beta = min(score + delta, CHECKMATE)
+        else:
+            return score
+        searchCounters["aspirationResearches"] += 1
+        delta *= 2
+
+def getWorkerPool():
+    """ The worker processes of the parallel search. Created once and kept, so their transposition tables survive. """
+
+    global workerPool, sharedAlpha, stopSearch
+    if workerPool is None:
+        if os.name == 'posix': 
+            # The workers must share this process' resource tracker, or each one frees the shared
+            # transposition table (see lazySMPSearch) when it exits.
+            from multiprocessing import resource_tracker
+            resource_tracker.ensure_running()
+        sharedAlpha = multiprocessing.Value('d', 0.0)
+        stopSearch = multiprocessing.Value('b', 0)
+        workerPool = multiprocessing.Pool(parallelWorkers, initializer=initWorker, initargs=(sharedAlpha, stopSearch))
+    return workerPool
+
+def initWorker(alpha, stop):
+    """ Runs once in each worker process of the pool. """
+
+    global sharedAlpha, stopSearch, searchInfo, showSearchSummary, multiPV
+    sharedAlpha = alpha
+    stopSearch = stop
+    setSearchTracer(None)
+    searchInfo = None # only the main process reports
+    showSearchSummary = False
+    multiPV = 1
+
+def parallelRootSearch(gs, validMoves):
+    """ 
+    Iterative deepening where each iteration splits the root moves over the worker pool.
+    The first (best so far) move is searched alone so the other moves start with a good alpha, then all the
+    others are searched at the same time. A worker that finishes with a better score raises the shared alpha
+    so the moves started after it get a narrower window. Only the time limit is used, not the node limit.
+    Returns the score and best line of the last iteration that completed, like iterativeDeepening.
+    """
+
+    global searchDepth, nodesSearched, positionsScored, workerTableUsage
+    pool = getWorkerPool()
+    stopSearch.value = 0
+    startSearchClock()
+    gameStateClass, fen, history = type(gs), gs.toFEN(), gs.positionHistory() # the workers need it for repetitions
+    rootMoves = list(validMoves)
+    pv = []
+    if useIterativeDeepening:
+        firstDepth, depthLimit = 1, min(maxIterativeDepth, MAX_PLY - 1) # see iterativeDeepening
+    else:
+        firstDepth, depthLimit = MAXDEPTH, MAXDEPTH
+    finalScore, finalSeq, completedDepth = 0, [], 0
+
+    for depth in range(firstDepth, depthLimit + 1):
+        sharedAlpha.value = -CHECKMATE
+        deadline = searchDeadline # None while pondering, set by ponderHit (see waitForRootMove)
+        args = [(gameStateClass, fen, history, move, depth, deadline, pv) for move in rootMoves]
+        results = [waitForRootMove(pool.apply_async(searchRootMove, args[0]), depth)]
+        if results[0] is not None:
+            pending = [pool.apply_async(searchRootMove, moveArgs) for moveArgs in args[1:]]
+            for result in pending: # wait for all of them, even after a timeout
+                results.append(waitForRootMove(result, depth))
+                if results[-1] is None: # out of time: the queued moves can't complete either, don't start them
+                    stopSearch.value = 1
+        for result in results:
+            if result is not None:
+                nodesSearched += result[2]
+                positionsScored += result[3]
+                if useTranspositionTable: # each worker has its own table, the summary shows them all
+                    transpositionTable.probes += result[5]
+                    transpositionTable.hits += result[6]
+                    workerTableUsage = max(workerTableUsage or 0, result[7])
+        if None in results: # out of time, the iteration is incomplete
+            break
+
+        # Best score first for the next iteration. On a tie an exact score beats a bound (the move failed low),
+        # then the sort is stable so the earlier move stays best.
+        order = sorted(range(len(rootMoves)), key=lambda i: (results[i][0], results[i][4]), reverse=True)
+        rootMoves = [rootMoves[i] for i in order]
+        finalScore, finalSeq = results[order[0]][0], results[order[0]][1]
+        completedDepth = depth
+        pv = finalSeq
+        if searchInfo is not None:
+            # the other scores are only bounds, no MultiPV here
+            searchInfo(depth, [(finalScore, gs.lineToMoves(finalSeq))])
+
+        if abs(finalScore) > CHECKMATE / 2:
+            break
+        if searchDeadline is not None and time.time() - searchStartTime > searchTimeLimit / 2:
+            break
+
+    searchDepth = completedDepth
+    return finalScore, finalSeq
+
+def waitForRootMove(result, depth):
+    """ 
+    Waits for the result of a searchRootMove task. The workers only know the deadline of the iteration when it
+    started: after a ponderHit this process stops them (see stopSearch) when the new deadline passes.
+    """
+
+    while not result.ready():
+        result.wait(ROOT_POLL_INTERVAL)
+        if depth > 1 and searchDeadline is not None and time.time() >= searchDeadline: # see checkSearchLimits
+            stopSearch.value = 1
+    return result.get()
+
+def searchRootMove(gameStateClass, fen, history, moveID, depth, deadline, pv):
+    """ 
+    Runs in a worker process: searches one root move to depth with the alpha shared by all the workers.
+    history is the zobrist keys of the positions before fen, for the repetitions (see GameState.positionHistory).
+    Returns (score, best line, nodes, positions scored, score is exact, transposition table probes, hits, usage)
+    or None if the deadline was reached.
+    The score is only an upper bound when it is not above the alpha the search started with.
+    """
+
+    global searchDepth, searchDeadline, searchNodeBudget, previousPV, nodesSearched, positionsScored
+    if depth > 1 and ((deadline is not None and time.time() >= deadline) or stopSearch.value): # see checkSearchLimits
+        return None
+    searchDepth, searchDeadline, searchNodeBudget = depth, deadline, 0
+    nodesSearched = positionsScored = 0
+    newSearchCounters()
+    previousPV = pv
+    probes, hits = (transpositionTable.probes, transpositionTable.hits) if useTranspositionTable else (0, 0)
+
+    gs = gameStateClass.fromFEN(fen)
+    gs.priorKeys = history
+    evSign = 1 if gs.whiteToMove else -1
+    alpha = sharedAlpha.value
+    gs.makeMoveID(moveID)
+    try:
+        if useRepetitionDetection and gs.repetitions(): # see NegaMax
+            score = DRAW
+            pvLength[1] = 0
+        else:
+            score = -NegaMaxAlphaBeta(gs, gs.getValidMoveIDs(), depth - 1, -CHECKMATE, -alpha, -evSign, 1, 
+                                      followPV=bool(pv) and pv[0] == moveID)
+    except SearchTimeout:
+        return None
+    seq = [moveID] + principalVariation(gs, 1)
+    with sharedAlpha.get_lock():
+        if score > sharedAlpha.value:
+            sharedAlpha.value = score
+    if not useTranspositionTable:
+        return score, seq, nodesSearched, positionsScored, score > alpha, 0, 0, 0
+    return score, seq, nodesSearched, positionsScored, score > alpha, transpositionTable.probes - probes, \
+           transpositionTable.hits - hits, transpositionTable.usage()
+
+def lazySMPSearch(gs, validMoves):
+    """ 
+    Lazy SMP: the pool workers run the same iterative deepening as this process, on the same root,
+    half of them starting one depth deeper and each with its own shuffled move order. The only communication
+    is the shared transposition table: the helpers fill it with results this process (and the others) reuse.
+    See https://www.chessprogramming.org/Lazy_SMP
+    This process stops the helpers when its own search ends. The deepest completed search gives the move.
+    """
+
+    global transpositionTable, searchDepth, nodesSearched, positionsScored
+    pool = getWorkerPool()
+    if not isinstance(transpositionTable, ChessTT.SharedTranspositionTable):
+        transpositionTable = ChessTT.SharedTranspositionTable(transpositionTableMB)
+        atexit.register(transpositionTable.close, True) # free the shared memory when this process exits
+    startSearchClock() # while pondering the helpers have no deadline, they are stopped with this process' search
+    deadline = searchDeadline
+    gameStateClass, fen, history = type(gs), gs.toFEN(), gs.positionHistory() # the workers need it for repetitions
+
+    stopSearch.value = 0
+    helpers = [pool.apply_async(lazySMPHelper, (gameStateClass, fen, history, helper, deadline, 
+                                                transpositionTable.name, transpositionTableMB))
+               for helper in range(parallelWorkers)]
+    if useIterativeDeepening:
+        finalScore, finalSeq = iterativeDeepening(gs, validMoves)
+        bestDepth = searchDepth
+    else:
+        finalScore, finalSeq = fixedDepthSearch(gs, validMoves)
+        bestDepth = MAXDEPTH if finalSeq else 0
+    stopSearch.value = 1
+
+    for helper in helpers:
+        depth, score, seq, nodes, positions = helper.get()
+        nodesSearched += nodes
+        positionsScored += positions
+        if depth > bestDepth and seq:
+            bestDepth, finalScore, finalSeq = depth, score, seq
+    stopSearch.value = 0
+    searchDepth = bestDepth
+    return finalScore, finalSeq
+
+def lazySMPHelper(gameStateClass, fen, history, helper, deadline, tableName, tableMB):
+    """ 
+    Runs in a worker process: iterative deepening on the root until stopped or out of time.
+    Returns (completed depth, score, best line, nodes, positions scored).
+    """
+
+    global transpositionTable, searchTimeLimit, nodesSearched, positionsScored
+    if not isinstance(transpositionTable, ChessTT.SharedTranspositionTable) or transpositionTable.name != tableName:
+        transpositionTable = ChessTT.SharedTranspositionTable(tableMB, name=tableName)
+    nodesSearched = positionsScored = 0
+    newSearchCounters()
+    searchTimeLimit = max(deadline - time.time(), 0.001) if deadline is not None else 0
+
+    gs = gameStateClass.fromFEN(fen)
+    gs.priorKeys = history
+    validMoves = gs.getValidMoveIDs()
+    random.shuffle(validMoves) # different move orders make the helpers search different parts of the tree
+    score, seq = iterativeDeepening(gs, validMoves, 1 + helper % 2)
+    return searchDepth, score, seq, nodesSearched, positionsScored
+
+def fixedDepthSearch(gs, validMoves):
+    """ 
+    Search to MAXDEPTH only. There are no time or node limits, but the search can still be stopped
+    (see stopSearch): it then returns an empty line.
+    """
+
+    global searchDepth, searchDeadline, searchNodeBudget, previousPV
+    searchDepth = MAXDEPTH
+    searchDeadline = None
+    searchNodeBudget = 0
+    previousPV = []
+    rootPly = gs.gamePly
+    try:
+        score = NegaMaxAlphaBeta(gs, 
+                                 validMoves, 
+                                 MAXDEPTH, 
+                                 -CHECKMATE, 
+                                 CHECKMATE, 
+                                 1 if gs.whiteToMove else -1)
+        return score, principalVariation(gs)
+    except SearchTimeout:
+        while gs.gamePly > rootPly:
+            gs.undoMoveID()
+        return 0, []
+
+class SearchTimeout(Exception):
+    """ Raised inside NegaMaxAlphaBeta when the time or node budget of the search is used up. """
+
+def checkSearchLimits():
+    """ Raises SearchTimeout if the search is over its budget. Depth 1 always completes so there is a move to play. """
+
+    if searchDepth > 1:
+        if (searchDeadline is not None and time.time() >= searchDeadline) or \
+            (searchNodeBudget and nodesSearched >= searchNodeBudget) or \
+            (stopSearch is not None and stopSearch.value):
+            raise SearchTimeout()
+
+def principalVariation(gs, ply=0):
+    """ 
+    Best line found by the last search from ply on (see pvTable), as a new list. gs is the position at ply.
+    pvTable stops at a transposition table hit: the line goes on with the hash moves stored in the table, as long
+    as they are legal and the position does not repeat. bestLine[1] (the move to ponder on) often comes from there.
+    """
+
+    line = pvTable[ply][:pvLength[ply]]
+    if not useTranspositionTable:
+        return line
+    startPly = gs.gamePly
+    for move in line:
+        gs.makeMoveID(move)
+    while ply + len(line) < MAX_PLY - 1:
+        entry = transpositionTable.probe(gs.zobristKey)
+        move = entry[4] if entry is not None else None
+        if move is None or gs.findPseudoLegalMove(move) is None or not gs.isLegal(move):
+            break
+        gs.makeMoveID(move)
+        if gs.repetitions():
+            break
+        line.append(move)
+    while gs.gamePly > startPly:
+        gs.undoMoveID()
+    return line
+
+def buildLateMoveReductions():
+    """ 
+    Reductions by [depth left][move number], growing with the log of both: the later the move in the ordering and 
+    the deeper the search, the less likely the move is best. See https://www.chessprogramming.org/Late_Move_Reductions
+    """
+
+    return [[int(0.75 + math.log(depth) * math.log(index) / 2.25) if depth > 0 and index > 0 else 0 
+             for index in range(64)] for depth in range(MAX_PLY)]
+
+LMR_TABLE = buildLateMoveReductions()
+
+def generateChildMoves(gs):
+    """ The moves of a new node, as NegaMaxAlphaBeta expects them. Triggers the STALEMATE and CHECKMATE flags. """
+
+    if not usePseudoLegalMoves:
+        return gs.getValidMoveIDs()
+    elif useStagedMoveGeneration:
+        return None # generated by the child, see getMoveIDsStaged
+    return gs.getPseudoLegalMoveIDs()
+
+def NegaMaxAlphaBeta(gs, validMoves, depth, alpha, beta, evSign, ply=0, hashMoveID=None, followPV=True, 
+                     allowNullMove=True):
+    """ 
+    This is the NegaMax recursive tree searcher. See https://en.wikipedia.org/wiki/Negamax
+    validMoves are moveIDs. Returns the score. The best line is left in pvTable[ply] (see principalVariation).
+    ply is the distance from the root. hashMoveID is the best move stored in the transposition table for this 
+    position, searched first. followPV is set while the moves from the root are those of previousPV.
+    allowNullMove is cleared right after a null move, two in a row would just search the same position again.
+    """
 
-        currentMoveSeq = moveSeq.copy()
-        currentMoveSeq.append(move)
+    global nodesSearched
+    nodesSearched += 1
+    if nodesSearched & 1023 == 0: # checking the clock is slow, only do it every 1024 nodes.
+        checkSearchLimits()
+
+    pvLength[ply] = 0
+    if validMoves is not None and len(validMoves) == 0: # we have reached a terminal node.
+        return (evSign * scoreBoard(gs)) + (ply if gs.checkmate else 0) # faster mates score higher
+
+    if depth == 0: # we have reached a leaf, resolve the captures before scoring it (avoids the horizon effect).
+        if useQuiescenceSearch:
+            return quiescenceSearch(gs, alpha, beta, evSign, ply, validMoves)
+        if usePseudoLegalMoves and not gs.getValidMoveIDs(): # the pseudo-legal moves did not set the flags
+            return (evSign * scoreBoard(gs)) + (ply if gs.checkmate else 0)
+        return evSign * scoreBoard(gs)
+
+    # Not gs.inCheck: it is only set by the last move generation, which can be a child's (e.g. in a re-search).
+    inCheck = gs.isInCheck()
+
+    # Reverse futility pruning: so far above beta that even losing a margin per depth left would still fail high.
+    # See https://www.chessprogramming.org/Reverse_Futility_Pruning
+    staticScore = evSign * (gs.materialScore + gs.positionScore) / 100 # not counted in positionsScored, not a leaf
+    if useReverseFutilityPruning and ply > 0 and depth <= REVERSE_FUTILITY_DEPTH and abs(beta) < CHECKMATE / 2 and \
+        staticScore - REVERSE_FUTILITY_MARGIN * depth >= beta and not inCheck:
+        searchCounters["reverseFutilityPrunes"] += 1
+        return staticScore - REVERSE_FUTILITY_MARGIN * depth
+
+    # Null-move pruning: let the opponent move twice. If a reduced search still fails high, a real move would too.
+    # Not in check (passing would be illegal), nor with only pawns left, where zugzwang makes passing the best move.
+    # See https://www.chessprogramming.org/Null_Move_Pruning
+    if useNullMovePruning and allowNullMove and ply > 0 and depth >= NULL_MOVE_MIN_DEPTH and \
+        beta < CHECKMATE / 2 and staticScore >= beta and \
+        not inCheck and gs.hasNonPawnMaterial(gs.whiteToMove):
+        reducedDepth = max(depth - 1 - NULL_MOVE_REDUCTION - (1 if depth > 6 else 0), 0)
+        gs.makeNullMove()
+        try:
+            score = -NegaMaxAlphaBeta(gs, generateChildMoves(gs), reducedDepth, -beta, -beta + NULL_WINDOW, -evSign,
+                                      ply + 1, allowNullMove=False)
+        finally:
+            gs.undoNullMove() # also when the search times out: the caller unwinds the real moves with undoMoveID
+        if score >= beta and useNullMoveVerification:
+            searchCounters["nullMoveVerifications"] += 1
+            score = NegaMaxAlphaBeta(gs, validMoves, reducedDepth + 1, beta - NULL_WINDOW, beta, evSign, ply, 
+                                     hashMoveID, followPV, allowNullMove=False)
+            pvLength[ply] = 0
+        if score >= beta:
+            searchCounters["nullMoveCutoffs"] += 1
+            return beta if score > CHECKMATE / 2 else score # a mate found after passing is not a real mate
 
-        # generate child nodes: possible move and triggers STALEMATE and CHECKMATE flags
-        nextMoves = gs.getValidMoves()
+    maxScore = -2*CHECKMATE  # this is our negative infinity per the algorithm
+    bestMove = None
+    alphaOrig = alpha # needed to know if the score stored in the transposition table is exact or a bound.
+    legalMoves = 0
+
+    # Search the best line of the previous iteration first, it is most likely still the best.
+    followPV = followPV and ply < len(previousPV)
+    if followPV:
+        hashMoveID = previousPV[ply]
+    if validMoves is None: # staged generation: the quiet moves are only generated if no earlier move cuts off.
+        if useMoveOrdering:
+            validMoves = gs.getMoveIDsStaged(hashMoveID, tuple(moveOrdering.killers[ply]),
+                                             lambda moves: moveOrdering.orderMoves(gs, moves, ply))
+        else:
+            validMoves = gs.getMoveIDsStaged(hashMoveID)
+    elif useMoveOrdering:
+        moveOrdering.orderMoves(gs, validMoves, ply, hashMoveID)
+    elif hashMoveID is not None:
+        for i in range(len(validMoves)):
+            if validMoves[i] == hashMoveID:
+                validMoves.insert(0, validMoves.pop(i))
+                break
+
+    # Futility pruning: at the frontier, a quiet move that does not give check can't bring the score up to alpha.
+    # See https://www.chessprogramming.org/Futility_Pruning
+    futilityScore = staticScore + FUTILITY_MARGINS[depth] if depth < len(FUTILITY_MARGINS) else None
+    futile = useFutilityPruning and futilityScore is not None and futilityScore <= alpha and not inCheck and \
+             abs(alpha) < CHECKMATE / 2
+    reduce = useLateMoveReductions and depth >= LMR_MIN_DEPTH and not inCheck
+
+    for move in validMoves:
 
-        # call NegaMax on the child nodes
-        score, childMoveSeq = NegaMaxAlphaBeta(gs, nextMoves, depth - 1, -beta, -alpha, -evSign, currentMoveSeq)
-        score *= -1
+        # create the next potential game state for a child node
+        gs.makeMoveID(move)
+
+        # Pseudo-legal moves are only tested here, so moves after a cutoff are never tested.
+        if usePseudoLegalMoves and gs.isKingAttacked(not gs.whiteToMove): # our king was left in check
+            gs.undoMoveID()
+            continue
+        legalMoves += 1
+        quietMove = not move & (MOVE_CAPTURE | MOVE_PROMOTION)
+        if futile and legalMoves > 1 and quietMove and not gs.isKingAttacked(gs.whiteToMove):
+            searchCounters["futilityPrunes"] += 1
+            if futilityScore > maxScore:
+                maxScore = futilityScore # the pruned move is worth at most this
+            gs.undoMoveID()
+            continue
+
+        # A repeated position is a draw: whoever can't do better will repeat it again. Checked before the 
+        # transposition table, whose score does not know the path to the position.
+        # A transposition table hit gives the child's score without generating its moves or searching it.
+        ttScore, childHashMoveID = None, None
+        if useRepetitionDetection and gs.repetitions():
+            searchCounters["repetitionDraws"] += 1
+            ttScore = DRAW # used like a table hit
+        elif useTranspositionTable:
+            ttScore, childHashMoveID = probeTranspositionTable(gs, depth - 1, -beta, -alpha, ply + 1)
+        if ttScore is not None:
+            score = -ttScore
+            pvLength[ply + 1] = 0 # the line stops here
+        else:
+            # generate child nodes: possible move and triggers STALEMATE and CHECKMATE flags
+            nextMoves = generateChildMoves(gs)
+
+            # call NegaMax on the child nodes. score is None until a search gave a usable score.
+            childFollowPV = followPV and move == hashMoveID
+            score = None
+            if reduce and legalMoves > LMR_MIN_MOVES and quietMove and not gs.isKingAttacked(gs.whiteToMove):
+                # LMR: a late quiet move is most likely bad, a shallower null window search is enough to show it.
+                reduction = min(LMR_TABLE[depth][min(legalMoves, 63)], depth - 1)
+                if reduction > 0:
+                    searchCounters["lateMoveReductions"] += 1
+                    score = -NegaMaxAlphaBeta(gs, nextMoves, depth - 1 - reduction, -alpha - NULL_WINDOW, -alpha, 
+                                              -evSign, ply + 1, childHashMoveID, childFollowPV)
+                    if score > alpha: # it may be good after all: search it at full depth
+                        searchCounters["lmrResearches"] += 1
+                        score = None
+            if score is None and usePVS and legalMoves > 1:
+                # PVS: the first move is most likely the best, only prove this one is not better (null window).
+                score = -NegaMaxAlphaBeta(gs, nextMoves, depth - 1, -alpha - NULL_WINDOW, -alpha, -evSign, ply + 1,
+                                          childHashMoveID, childFollowPV)
+                if alpha < score < beta: # it is better: search again for its exact score
+                    searchCounters["pvsResearches"] += 1
+                    score = None
+            if score is None:
+                score = -NegaMaxAlphaBeta(gs, nextMoves, depth - 1, -beta, -alpha, -evSign, ply + 1, childHashMoveID,
+                                          childFollowPV)
 
         # this is the equivalent of the max function in the algorithm.        
         if score > maxScore:
             maxScore = score
-            bestSeq = childMoveSeq.copy()
+            bestMove = move
+
+            if score > alpha: # new best line: this move followed by the child's best line
+                childLength = pvLength[ply + 1]
+                line = pvTable[ply]
+                line[0] = move
+                line[1:childLength + 1] = pvTable[ply + 1][:childLength]
+                pvLength[ply] = childLength + 1
 
-            if searchTreeExportEnable:
-                if depth == MAXDEPTH: # We are the 1st row of children, record new temporary best move.
-                    currentBestMove = move 
+            if tracing and ply == 0: # We are the 1st row of children, record new temporary best move.
+                searchTracer.newBestRootMove(gs.lastMoves(1)[0])
 
-        if searchTreeExportEnable: 
-            searchTree.insertData(depth, currentMoveSeq, evSign * score, str(currentBestMove))
+        if tracing: 
+            searchTracer.node(depth, gs.lastMoves(ply + 1), evSign * score)
 
-        gs.undoMove() # return the game state to the prior parent node so we can loop to next child
+        gs.undoMoveID() # return the game state to the prior parent node so we can loop to next child
 
         if maxScore > alpha: # Can we increase our lower (minimum) boundary?
            alpha = maxScore
 
         if alpha >= beta:  # If boundaries cross, not longer need to search. Prune child branches. 
+            if useMoveOrdering:
+                moveOrdering.recordCutoff(gs, move, legalMoves - 1, ply, depth)
             break
+
+    if legalMoves == 0: # only possible with pseudo-legal moves: none of them was legal.
+        return -CHECKMATE + ply if inCheck else STALEMATE
+
+    if useTranspositionTable:
+        if maxScore <= alphaOrig:
+            flag = ChessTT.UPPERBOUND
+        elif maxScore >= beta:
+            flag = ChessTT.LOWERBOUND
+        else:
+            flag = ChessTT.EXACT
+        transpositionTable.store(gs.zobristKey, depth, scoreToTranspositionTable(maxScore, ply), flag, bestMove)
   
-    return maxScore, bestSeq  
+    return maxScore
+
+def quiescenceSearch(gs, alpha, beta, evSign, ply, validMoves=None, qDepth=0):
+    """ 
+    Searches only captures and promotions (all moves when in check) until the position is quiet.
+    See https://www.chessprogramming.org/Quiescence_Search
+    The side to move can always "stand pat" (keep the static score) instead of capturing.
+    validMoves are the already generated moves of the first node, so they don't have to be generated again.
+    """
+
+    global nodesSearched
+    nodesSearched += 1
+    if nodesSearched & 1023 == 0:
+        checkSearchLimits()
+
+    if qDepth >= maxQuiescenceDepth:
+        return evSign * scoreBoard(gs)
+
+    if validMoves is None:
+        moves = gs.getCaptureMoveIDs() # legal moves
+        inCheck = gs.inCheck # just set by getCaptureMoveIDs, overwritten by the child nodes
+    else:
+        # The parent may have searched these moves before (a PVS or LMR re-search), gs.inCheck is stale then.
+        inCheck = gs.isInCheck()
+        moves = validMoves if inCheck else \
+                [move for move in validMoves if move & (MOVE_CAPTURE | MOVE_PROMOTION)]
+    checkLegality = validMoves is not None and usePseudoLegalMoves # moves from the parent may be pseudo-legal
+
+    if inCheck:
+        standPat = -2*CHECKMATE # no standing pat when in check, every evasion is searched.
+    else:
+        standPat = evSign * scoreBoard(gs)
+        if standPat >= beta:
+            return standPat
+        if standPat > alpha:
+            alpha = standPat
+
+    if useMoveOrdering:
+        moveOrdering.orderMoves(gs, moves, min(ply, ChessMoveOrdering.MAX_PLY - 1))
+
+    maxScore = standPat
+    legalMoves = 0
+    for move in moves:
+        # Delta pruning: even winning the captured piece for free (plus a margin) would not raise alpha.
+        if not inCheck and not move & MOVE_PROMOTION and \
+            standPat + pieceScore[gs.capturedPiece(move)[1]] + DELTA_MARGIN <= alpha:
+            continue
+
+        gs.makeMoveID(move)
+        if checkLegality and gs.isKingAttacked(not gs.whiteToMove):
+            gs.undoMoveID()
+            continue
+        legalMoves += 1
+        score = -quiescenceSearch(gs, -beta, -alpha, -evSign, ply + 1, None, qDepth + 1)
+        gs.undoMoveID()
+
+        if score > maxScore:
+            maxScore = score
+            if score > alpha:
+                alpha = score
+                if alpha >= beta:
+                    break
+
+    if inCheck and legalMoves == 0: # checkmate
+        return -CHECKMATE + ply
+    return maxScore
+
+def probeTranspositionTable(gs, depth, alpha, beta, ply):
+    """ 
+    Returns (score, hashMoveID) for the position, at ply from the root. score is the stored score if the position 
+    was searched at least as deep and the stored bound is enough to decide against the alpha/beta window, 
+    None otherwise. hashMoveID is the stored best move (or None), to be searched first.
+    """
+
+    entry = transpositionTable.probe(gs.zobristKey)
+    if entry is None:
+        return None, None
+    if entry[1] < depth:
+        return None, entry[4]
+    score = scoreFromTranspositionTable(entry[2], ply)
+    flag = entry[3]
+    if flag == ChessTT.EXACT or \
+        (flag == ChessTT.LOWERBOUND and score >= beta) or \
+        (flag == ChessTT.UPPERBOUND and score <= alpha):
+        return score, entry[4]
+    return None, entry[4]
+
+def scoreToTranspositionTable(score, ply):
+    """
+    Mate scores are CHECKMATE - the ply of the mate from the root, so they depend on where the node is in the tree.
+    Store them as the distance to the mate from the node instead, so they can be reused at any ply.
+    """
+
+    if score > CHECKMATE / 2:
+        return score + ply
+    elif score < -CHECKMATE / 2:
+        return score - ply
+    return score
+
+def scoreFromTranspositionTable(score, ply):
+    """ Opposite of scoreToTranspositionTable. """
+
+    if score > CHECKMATE / 2:
+        return score - ply
+    elif score < -CHECKMATE / 2:
+        return score + ply
+    return score
 
 def scoreBoard(gs):
     """ 
-    Score the board based on material and others 
+    Score the board based on material and piece positions (see ChessEvaluation).
     A positive score is good for white. Negative is good for black.
     This scoring function is not affected by who is next to move.
     """
@@ -182,16 +865,8 @@ def scoreBoard(gs):
     positionsScored += 1
 
     if gs.checkmate: 
-        return CHECKMATE * -1 if gs.whiteToMove else 1
+        return -CHECKMATE if gs.whiteToMove else CHECKMATE
     elif gs.stalemate:
         return STALEMATE
 
-    score = 0
-    for row in range(len(gs.board)):
-        for col in range(len(gs.board[row])):
-            square = gs.board[row][col]
-            if square != '--' and square != 'K':
-                score += (pieceScore[square[1]] + 
-                          piecePositionScores[square][row][col]) * (1 if square[0] == 'w' else -1)
-    return score
-
+    return (gs.materialScore + gs.positionScore) / 100 # kept up to date by makeMove/undoMove, in centipawns
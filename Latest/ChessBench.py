@@ -0,0 +1,84 @@
+"""
+Search benchmark: searches a fixed set of positions to a fixed depth and reports the nodes, time and the
+search counters (re-searches, prunings...). Compare runs to measure what a search option saves.
+
+    python ChessBench.py --depth 5
+    python ChessBench.py --depth 5 --set usePVS=False --set useAspirationWindows=False
+    python ChessBench.py --depth 5 --set useNullMovePruning=True --set useLateMoveReductions=True
+
+The searches are reproducible: the random move shuffle is seeded and the tables are cleared for each position.
+"""
+
+import argparse
+import queue
+import random
+import time
+import ChessEngine
+import ChessBitboard
+import ChessTranspositionTable as ChessTT
+import ChessAI
+
+BENCH_POSITIONS = [
+    ("start", ChessEngine.START_FEN),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"),
+    ("italian", "r1bqk2r/pppp1ppp/2n2n2/2b1p3/2B1P3/2NP1N2/PPP2PPP/R1BQK2R b KQkq - 0 5"),
+    ("position 6", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10"),
+    ("queen's gambit", "r1bq1rk1/pp2bppp/2n1pn2/2pp4/2PP4/2N1PN2/PP2BPPP/R1BQ1RK1 w - - 0 8"),
+    ("rook endgame", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1"),
+    ("minor pieces", "2r3k1/pp3ppp/2n5/3p4/3P4/2N2N2/PP3PPP/2R3K1 w - - 0 20"),
+    ("pawn endgame", "8/5pk1/6p1/7p/5P1P/6PK/8/8 w - - 0 40"),
+]
+
+def runBench(depth, gameStateClass):
+    """ Searches every position to depth. Returns (nodes, seconds, {counter: total}). """
+
+    ChessAI.useIterativeDeepening = True
+    ChessAI.searchTimeLimit = 0
+    ChessAI.searchNodeLimit = 0
+    ChessAI.maxIterativeDepth = depth
+    ChessAI.showSearchSummary = False
+    totalNodes, totalTime, counters = 0, 0.0, {}
+
+    for name, fen in BENCH_POSITIONS:
+        ChessAI.newGame()
+        random.seed(0)
+        gs = gameStateClass.fromFEN(fen)
+        returnQueue = queue.Queue()
+        startTime = time.time()
+        ChessAI.findBestMove(gs, gs.getValidMoves(), returnQueue)
+        elapsed = time.time() - startTime
+        bestMove = returnQueue.get()
+
+        totalNodes += ChessAI.nodesSearched
+        totalTime += elapsed
+        for counter, value in ChessAI.searchCounters.items():
+            counters[counter] = counters.get(counter, 0) + value
+        print(f'{name:<15} {str(bestMove):>6} {ChessAI.nodesSearched:>9} nodes {elapsed:7.2f}s  ' +
+              " ".join(str(move) for move in ChessAI.bestLine))
+
+    return totalNodes, totalTime, counters
+
+def main():
+    parser = argparse.ArgumentParser(description="Search benchmark on fixed positions.")
+    parser.add_argument("--depth", type=int, default=4, help="search depth (default: 4)")
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=VALUE",
+                        help="ChessAI setting to change, e.g. usePVS=False. Can be repeated.")
+    parser.add_argument("--engine", choices=("bitboard", "list"), default="bitboard", help="move generator to use")
+    args = parser.parse_args()
+
+    for setting in args.set:
+        try:
+            name, value = ChessAI.parseSetting(setting)
+        except ValueError as error:
+            parser.error(str(error))
+        setattr(ChessAI, name, value)
+    if ChessAI.useTranspositionTable: # the table was built with the default size when ChessAI was imported
+        ChessAI.transpositionTable = ChessTT.TranspositionTable(ChessAI.transpositionTableMB)
+
+    gameStateClass = ChessEngine.GameState if args.engine == "list" else ChessBitboard.BitboardGameState
+    nodes, elapsed, counters = runBench(args.depth, gameStateClass)
+    print(f'Total: {nodes} nodes in {elapsed:.2f}s ({nodes / max(elapsed, 1e-6):,.0f} nodes/s)')
+    print("Counters: " + ", ".join(f"{counter} {value}" for counter, value in counters.items()))
+
+if __name__ == "__main__":
+    main()
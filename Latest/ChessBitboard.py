@@ -0,0 +1,493 @@
+"""
+Bitboard version of the GameState.
+
+Each of the twelve pieces ("wP", "bK", ...) is stored as a 64-bit integer where bit (row * 8 + col) is set
+when the piece sits on that square. Bit 0 is a8 and bit 63 is h1, the same orientation as GameState.board.
+Moves are generated set-wise with bit operations instead of walking the board square by square.
+
+The bitboards and the mailbox (a flat list of the 64 squares, for the square -> piece lookups of makeMoveID,
+pieceAt and the move ordering) are the position: movePieces / unmovePieces update both. There is no 8x8 list
+board any more. GameState.board is built from the mailbox when it is read, for ChessMain.drawPieces and the
+Move objects of the GUI.
+"""
+
+import ChessEngine
+from ChessEngine import MOVE_CAPTURE, MOVE_ENPASSANT, MOVE_CASTLE, MOVE_PROMOTION
+
+PIECES = ("wP", "wN", "wB", "wR", "wQ", "wK", "bP", "bN", "bB", "bR", "bQ", "bK")
+FULL_BOARD = (1 << 64) - 1
+
+# Same order as checkForPinsAndChecks: rows/columns first (0 to 3), then diagonals (4 to 7).
+DIRECTIONS = ((-1, 0), (0, -1), (1, 0), (0, 1),
+              (-1, -1), (-1, 1), (1, -1), (1, 1))
+ROOK_DIRECTIONS = (0, 1, 2, 3)
+BISHOP_DIRECTIONS = (4, 5, 6, 7)
+POSITIVE_DIRECTION = tuple(d[0] * 8 + d[1] > 0 for d in DIRECTIONS) # True if the square index grows along the ray
+
+NOT_FILE_A = FULL_BOARD ^ sum(1 << (r * 8) for r in range(8))
+NOT_FILE_H = FULL_BOARD ^ sum(1 << (r * 8 + 7) for r in range(8))
+PAWN_THIRD_ROW = {'w': 0xFF << 40, 'b': 0xFF << 16} # where a pawn lands after its first 1 square advance
+PROMOTION_ROW = {'w': 0xFF, 'b': 0xFF << 56}
+
+KNIGHT_OFFSETS = ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1))
+SLIDER_DIRECTIONS = {'B': BISHOP_DIRECTIONS, 'R': ROOK_DIRECTIONS, 'Q': tuple(range(8))}
+CASTLE_ROOK_SQUARES = {62: (63, 61), 58: (56, 59), 6: (7, 5), 2: (0, 3)} # king end square: rook (from, to)
+
+
+def squareBit(r, c):
+    """ Returns the bitboard with only the square at row, col set. """
+
+    return 1 << (r * 8 + c)
+
+
+def offsetsMask(r, c, offsets):
+    """ Bitboard of all the on-board squares reached from row, col by the given (row, col) offsets. """
+
+    mask = 0
+    for dr, dc in offsets:
+        if 0 <= r + dr < 8 and 0 <= c + dc < 8:
+            mask |= squareBit(r + dr, c + dc)
+    return mask
+
+
+def buildTables():
+    """ Precompute the attack tables. Called once at import. """
+
+    knight, king, whitePawn, blackPawn = [], [], [], []
+    rays = [[0] * 64 for _ in DIRECTIONS]
+    between = [[0] * 64 for _ in range(64)]
+
+    for sq in range(64):
+        r, c = divmod(sq, 8)
+        knight.append(offsetsMask(r, c, KNIGHT_OFFSETS))
+        king.append(offsetsMask(r, c, DIRECTIONS))
+        whitePawn.append(offsetsMask(r, c, ((-1, -1), (-1, 1))))
+        blackPawn.append(offsetsMask(r, c, ((1, -1), (1, 1))))
+
+        for j, d in enumerate(DIRECTIONS):
+            path = 0 # squares passed so far, used for the between table
+            for i in range(1, 8):
+                endRow = r + d[0] * i
+                endCol = c + d[1] * i
+                if not (0 <= endRow < 8 and 0 <= endCol < 8):
+                    break
+                rays[j][sq] |= squareBit(endRow, endCol)
+                between[sq][endRow * 8 + endCol] = path
+                path |= squareBit(endRow, endCol)
+
+    return knight, king, {'w': whitePawn, 'b': blackPawn}, rays, between
+
+KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, RAYS, BETWEEN = buildTables()
+
+
+def shift(bb, delta):
+    """ Moves every bit of the bitboard by delta squares (negative is toward row 0), dropping bits off the board. """
+
+    return bb >> -delta if delta < 0 else (bb << delta) & FULL_BOARD
+
+
+def squares(bb):
+    """ Yields the index of every bit set in the bitboard, lowest first. """
+
+    while bb:
+        lsb = bb & -bb
+        yield lsb.bit_length() - 1
+        bb ^= lsb
+
+
+def slidingAttacks(sq, occupied, directions):
+    """ Squares attacked from sq along the given directions, stopping at (and including) the first blocker. """
+
+    attacks = 0
+    for j in directions:
+        ray = RAYS[j][sq]
+        blockers = ray & occupied
+        if blockers:
+            if POSITIVE_DIRECTION[j]:
+                first = (blockers & -blockers).bit_length() - 1
+            else:
+                first = blockers.bit_length() - 1
+            ray ^= RAYS[j][first] # remove everything behind the blocker
+        attacks |= ray
+    return attacks
+
+
+class BitboardGameState(ChessEngine.GameState):
+    """
+    Drop-in replacement for ChessEngine.GameState using bitboards for the position and the move generation.
+    makeMove, undoMove and getValidMoves follow the same contract and return the same Move objects.
+    """
+
+    def __init__(self, fen=ChessEngine.START_FEN) -> None:
+        super().__init__(fen) # GameState.__init__ calls loadFEN, which sets board and so builds the bitboards.
+
+    @property
+    def board(self):
+        """ The 8x8 list board (see GameState), built from the mailbox. Changing it does not change the position. """
+
+        mailbox = self.mailbox
+        return [mailbox[sq:sq + 8] for sq in range(0, 64, 8)]
+
+    @board.setter
+    def board(self, board):
+        """ Sets up the pieces of an 8x8 list board (GameState.loadFEN does). """
+
+        self.loadBitboards(board)
+
+    def loadBitboards(self, board):
+        """ (Re)builds the bitboards, occupancy masks and mailbox from an 8x8 list board. """
+
+        self.bitboards = {piece: 0 for piece in PIECES}
+        self.occupancy = {'w': 0, 'b': 0}
+        self.mailbox = [square for row in board for square in row]
+        for r in range(8):
+            for c in range(8):
+                piece = board[r][c]
+                if piece != '--':
+                    self.bitboards[piece] |= squareBit(r, c)
+                    self.occupancy[piece[0]] |= squareBit(r, c)
+
+    def pieceAt(self, sq):
+        """ The piece on the square (row * 8 + col), '--' if empty. """
+
+        return self.mailbox[sq]
+
+    def movePieces(self, move):
+        """ Moves the pieces of a move (a moveID) on the bitboards and the mailbox, see GameState.movePieces. """
+
+        mailbox = self.mailbox
+        bitboards = self.bitboards
+        occupancy = self.occupancy
+        start = move & 63
+        end = move >> 6 & 63
+        pieceMoved = mailbox[start]
+        ally = pieceMoved[0]
+
+        # an en passant capture removes the pawn beside the start square, not on the end square.
+        captureSq = (start & 56) | (end & 7) if move & MOVE_ENPASSANT else end
+        pieceCaptured = mailbox[captureSq]
+        if pieceCaptured != '--':
+            bitboards[pieceCaptured] ^= 1 << captureSq
+            occupancy[pieceCaptured[0]] ^= 1 << captureSq
+            mailbox[captureSq] = '--'
+
+        finalPiece = ally + 'Q' if move & MOVE_PROMOTION else pieceMoved
+        mailbox[start] = '--'
+        mailbox[end] = finalPiece
+        bitboards[pieceMoved] ^= 1 << start
+        bitboards[finalPiece] ^= 1 << end
+        occupancy[ally] ^= 1 << start | 1 << end
+
+        if move & MOVE_CASTLE:
+            rookFrom, rookTo = CASTLE_ROOK_SQUARES[end]
+            mailbox[rookTo] = mailbox[rookFrom]
+            mailbox[rookFrom] = '--'
+            bitboards[ally + 'R'] ^= 1 << rookFrom | 1 << rookTo
+            occupancy[ally] ^= 1 << rookFrom | 1 << rookTo
+        return pieceMoved, pieceCaptured
+
+    def unmovePieces(self, move, pieceMoved, pieceCaptured):
+        """ Opposite of movePieces: puts the pieces of the move back where they were. """
+
+        mailbox = self.mailbox
+        bitboards = self.bitboards
+        occupancy = self.occupancy
+        start = move & 63
+        end = move >> 6 & 63
+        ally = pieceMoved[0]
+
+        finalPiece = mailbox[end]
+        mailbox[end] = '--'
+        mailbox[start] = pieceMoved
+        bitboards[finalPiece] ^= 1 << end
+        bitboards[pieceMoved] ^= 1 << start
+        occupancy[ally] ^= 1 << start | 1 << end
+
+        if pieceCaptured != '--':
+            captureSq = (start & 56) | (end & 7) if move & MOVE_ENPASSANT else end
+            mailbox[captureSq] = pieceCaptured
+            bitboards[pieceCaptured] ^= 1 << captureSq
+            occupancy[pieceCaptured[0]] ^= 1 << captureSq
+
+        if move & MOVE_CASTLE:
+            rookFrom, rookTo = CASTLE_ROOK_SQUARES[end]
+            mailbox[rookFrom] = mailbox[rookTo]
+            mailbox[rookTo] = '--'
+            bitboards[ally + 'R'] ^= 1 << rookFrom | 1 << rookTo
+            occupancy[ally] ^= 1 << rookFrom | 1 << rookTo
+
+    def hasNonPawnMaterial(self, white):
+        """ True if the side has a piece other than its king and pawns (see GameState.hasNonPawnMaterial). """
+
+        color = 'w' if white else 'b'
+        return self.occupancy[color] & ~(self.bitboards[color + 'P'] | self.bitboards[color + 'K']) != 0
+
+    def attackersTo(self, sq, color, occupied):
+        """ Bitboard of the pieces of the given color attacking sq, given the occupied squares. """
+
+        bb = self.bitboards
+        return (KNIGHT_ATTACKS[sq] & bb[color + 'N']) | \
+               (KING_ATTACKS[sq] & bb[color + 'K']) | \
+               (PAWN_ATTACKS['b' if color == 'w' else 'w'][sq] & bb[color + 'P']) | \
+               (slidingAttacks(sq, occupied, ROOK_DIRECTIONS) & (bb[color + 'R'] | bb[color + 'Q'])) | \
+               (slidingAttacks(sq, occupied, BISHOP_DIRECTIONS) & (bb[color + 'B'] | bb[color + 'Q']))
+
+    def getPinnedPieces(self, kingSq, allyColor, enemyColor):
+        """
+        Returns a dictionary {square: allowed bitboard} for every ally piece pinned to its king.
+        A pinned piece may only move on the line between the king and the pinning piece (capture included).
+        """
+
+        pinned = {}
+        own = self.occupancy[allyColor]
+        occupied = own | self.occupancy[enemyColor]
+        rookLike = self.bitboards[enemyColor + 'R'] | self.bitboards[enemyColor + 'Q']
+        bishopLike = self.bitboards[enemyColor + 'B'] | self.bitboards[enemyColor + 'Q']
+
+        for j in range(8):
+            sliders = rookLike if j < 4 else bishopLike
+            if not RAYS[j][kingSq] & sliders:
+                continue
+            blockers = RAYS[j][kingSq] & occupied
+            if not blockers:
+                continue
+            first = (blockers & -blockers).bit_length() - 1 if POSITIVE_DIRECTION[j] else blockers.bit_length() - 1
+            if not own & (1 << first):
+                continue
+            blockers = RAYS[j][first] & occupied
+            if not blockers:
+                continue
+            second = (blockers & -blockers).bit_length() - 1 if POSITIVE_DIRECTION[j] else blockers.bit_length() - 1
+            if sliders & (1 << second):
+                pinned[first] = BETWEEN[kingSq][second] | (1 << second)
+        return pinned
+
+    def getValidMoveIDs(self):
+        """ All moves considering checks, as moveIDs. """
+
+        moves = self.getMovesBitboard(False)
+        if len(moves) == 0:
+            if self.inCheck:
+                self.checkmate = True
+            else:
+                self.stalemate = True
+        return moves
+
+    def getCaptureMoveIDs(self):
+        """ 
+        Only the captures and promotions among the valid moves. Used by the quiescence search.
+        When in check all the valid moves are returned since every evasion has to be looked at.
+        """
+
+        moves = self.getMovesBitboard(True)
+        if len(moves) == 0 and self.inCheck:
+            self.checkmate = True
+        return moves
+
+    def getPseudoLegalMoveIDs(self, capturesOnly=False):
+        """ 
+        All moves ignoring checks and pins. Sets self.inCheck. Moves must be tested with isLegal.
+        With capturesOnly, only captures and promotions (even when in check).
+        """
+
+        return self.getMovesBitboard(capturesOnly, pseudoLegal=True)
+
+    def getQuietMoveIDs(self):
+        """ Pseudo-legal moves that are neither captures nor promotions: the last stage of getMoveIDsStaged. """
+
+        return self.getMovesBitboard(False, pseudoLegal=True, quietsOnly=True)
+
+    def findPseudoLegalMove(self, moveID):
+        """ 
+        moveID if it is a pseudo-legal move in the current position, else None. Used for hash moves and killers.
+        Only this move is tested: the piece on its start square reaches its end square and its flags are the ones 
+        getMovesBitboard would give it. Castles and en passant captures (rare) are looked up in the generated moves.
+        """
+
+        start = moveID & 63
+        end = moveID >> 6 & 63
+        piece = self.mailbox[start]
+        allyColor, enemyColor = ('w', 'b') if self.whiteToMove else ('b', 'w')
+        if piece[0] != allyColor:
+            return None
+        own = self.occupancy[allyColor]
+        enemy = self.occupancy[enemyColor]
+        occupied = own | enemy
+        endBit = 1 << end
+
+        if moveID & MOVE_CASTLE:
+            moves = []
+            if piece[1] == 'K' and not self.attackersTo(start, enemyColor, occupied):
+                self.getCastleMovesBitboard(moves, start, enemyColor, occupied)
+            return moveID if moveID in moves else None
+        if moveID & MOVE_ENPASSANT:
+            return moveID if moveID in self.getPseudoLegalMoveIDs(capturesOnly=True) else None
+
+        flags = MOVE_CAPTURE if enemy & endBit else 0
+        if piece[1] == 'P':
+            forward = -8 if allyColor == 'w' else 8
+            if flags:
+                reached = PAWN_ATTACKS[allyColor][start] & endBit
+            elif end == start + forward:
+                reached = not occupied & endBit
+            else:
+                reached = end == start + 2 * forward and not occupied & (endBit | 1 << (start + forward)) and \
+                          (1 << (start + forward)) & PAWN_THIRD_ROW[allyColor]
+            if PROMOTION_ROW[allyColor] & endBit:
+                flags |= MOVE_PROMOTION
+        elif piece[1] == 'N':
+            reached = KNIGHT_ATTACKS[start] & endBit
+        elif piece[1] == 'K':
+            reached = KING_ATTACKS[start] & endBit
+        else:
+            reached = slidingAttacks(start, occupied, SLIDER_DIRECTIONS[piece[1]]) & endBit
+        return moveID if reached and not own & endBit and moveID == start | end << 6 | flags else None
+
+    def isKingAttacked(self, white):
+        """ Fast check test: is the king of the given color attacked? """
+
+        allyColor, enemyColor = ('w', 'b') if white else ('b', 'w')
+        return self.attackersTo(self.bitboards[allyColor + 'K'].bit_length() - 1, enemyColor,
+                                self.occupancy['w'] | self.occupancy['b']) != 0
+
+    def getMovesBitboard(self, capturesOnly, pseudoLegal=False, quietsOnly=False):
+        """ 
+        Legal moves, or only legal captures and promotions when capturesOnly and not in check.
+        With pseudoLegal, checks and pins are ignored: moves may leave the king in check (see GameState.isLegal).
+        quietsOnly is the complement of capturesOnly. Both are honored in check when pseudoLegal.
+        """
+
+        moves = []
+        bb = self.bitboards
+        if self.whiteToMove:
+            allyColor, enemyColor, forward, startRow = 'w', 'b', -8, 6
+        else:
+            allyColor, enemyColor, forward, startRow = 'b', 'w', 8, 1
+        own = self.occupancy[allyColor]
+        enemy = self.occupancy[enemyColor]
+        occupied = own | enemy
+
+        kingSq = bb[allyColor + 'K'].bit_length() - 1
+        checkers = self.attackersTo(kingSq, enemyColor, occupied)
+        self.inCheck = checkers != 0
+        capturesOnly = capturesOnly and (pseudoLegal or not checkers)
+        if capturesOnly:
+            notOwn = enemy
+        elif quietsOnly:
+            notOwn = ~occupied & FULL_BOARD
+        else:
+            notOwn = ~own
+
+        # King moves: the king is removed from the occupancy so it cannot hide behind itself from a slider.
+        occupiedNoKing = occupied ^ (1 << kingSq)
+        for sq in squares(KING_ATTACKS[kingSq] & notOwn):
+            if pseudoLegal or not self.attackersTo(sq, enemyColor, occupiedNoKing):
+                moves.append(kingSq | sq << 6 | (MOVE_CAPTURE if enemy >> sq & 1 else 0))
+
+        if pseudoLegal or checkers & (checkers - 1) == 0: # not a double check, so other pieces may move.
+            if checkers and not pseudoLegal:
+                # to block a check you must capture the checking piece or move between king and checker.
+                checkerSq = checkers.bit_length() - 1
+                checkMask = checkers | BETWEEN[kingSq][checkerSq]
+            else:
+                checkMask = FULL_BOARD
+            pinned = {} if pseudoLegal else self.getPinnedPieces(kingSq, allyColor, enemyColor)
+            targetMask = notOwn & checkMask
+
+            for piece, directions in (('N', None), ('B', SLIDER_DIRECTIONS['B']),
+                                      ('R', SLIDER_DIRECTIONS['R']), ('Q', SLIDER_DIRECTIONS['Q'])):
+                for sq in squares(bb[allyColor + piece]):
+                    if directions is None:
+                        targets = KNIGHT_ATTACKS[sq] & targetMask
+                    else:
+                        targets = slidingAttacks(sq, occupied, directions) & targetMask
+                    if sq in pinned:
+                        targets &= pinned[sq]
+                    for endSq in squares(targets & enemy):
+                        moves.append(sq | endSq << 6 | MOVE_CAPTURE)
+                    for endSq in squares(targets & ~enemy):
+                        moves.append(sq | endSq << 6)
+
+            self.getPawnMovesBitboard(moves, allyColor, enemyColor, forward, startRow,
+                                      kingSq, occupied, checkMask, pinned, capturesOnly, quietsOnly)
+
+            if not checkers and not capturesOnly:
+                self.getCastleMovesBitboard(moves, kingSq, enemyColor, occupied)
+
+        return moves
+
+    def getPawnMovesBitboard(self, moves, allyColor, enemyColor, forward, startRow,
+                             kingSq, occupied, checkMask, pinned, capturesOnly=False, quietsOnly=False):
+        """
+        Get all the pawn moves (pushes, captures and en passant) and add these moves to the list.
+        Unpinned pawns are moved all at once by shifting the pawn bitboard. Pinned pawns are done one by one.
+        With capturesOnly, pushes are limited to promotions. With quietsOnly, only the other pushes.
+        """
+
+        enemy = 0 if quietsOnly else self.occupancy[enemyColor]
+        promotionRow = PROMOTION_ROW[allyColor]
+        empty = ~occupied & FULL_BOARD
+        if capturesOnly:
+            pushMask = checkMask & promotionRow
+        elif quietsOnly:
+            pushMask = checkMask & ~promotionRow
+        else:
+            pushMask = checkMask
+        pawns = self.bitboards[allyColor + 'P']
+        pinnedPawns = 0
+        for sq in pinned:
+            pinnedPawns |= pawns & (1 << sq)
+
+        freePawns = pawns ^ pinnedPawns
+        oneStep = shift(freePawns, forward) & empty
+        twoStep = shift(oneStep & PAWN_THIRD_ROW[allyColor], forward) & empty
+        leftCaptures = shift(freePawns & NOT_FILE_A, forward - 1) & enemy
+        rightCaptures = shift(freePawns & NOT_FILE_H, forward + 1) & enemy
+
+        # delta is the distance from the start square, so the start square is endSq - delta.
+        for delta, targets, flags in ((forward, oneStep & pushMask, 0), (2 * forward, twoStep & pushMask, 0),
+                                      (forward - 1, leftCaptures & checkMask, MOVE_CAPTURE),
+                                      (forward + 1, rightCaptures & checkMask, MOVE_CAPTURE)):
+            for endSq in squares(targets & ~promotionRow):
+                moves.append(endSq - delta | endSq << 6 | flags)
+            for endSq in squares(targets & promotionRow):
+                moves.append(endSq - delta | endSq << 6 | flags | MOVE_PROMOTION)
+
+        for sq in squares(pinnedPawns):
+            allowed = checkMask & pinned[sq]
+            endSq = sq + forward
+            if not occupied & (1 << endSq):                             # Check for 1 square advance
+                if allowed & pushMask & (1 << endSq):
+                    moves.append(sq | endSq << 6 | (MOVE_PROMOTION if promotionRow >> endSq & 1 else 0))
+                endSq += forward
+                if sq >> 3 == startRow and not occupied & (1 << endSq) and allowed & pushMask & (1 << endSq):
+                    moves.append(sq | endSq << 6)
+            for endSq in squares(PAWN_ATTACKS[allyColor][sq] & enemy & allowed):
+                moves.append(sq | endSq << 6 | MOVE_CAPTURE | (MOVE_PROMOTION if promotionRow >> endSq & 1 else 0))
+
+        if self.enpassantPossible != () and not quietsOnly:
+            epSq = self.enpassantPossible[0] * 8 + self.enpassantPossible[1]
+            capturedSq = epSq - forward
+            # pawns that could capture on epSq are the ones an enemy pawn on epSq would attack.
+            for sq in squares(PAWN_ATTACKS[enemyColor][epSq] & pawns):
+                # Play the capture on the occupancy and make sure nothing attacks the king afterward.
+                # This covers checks, pins and the rare case of both pawns leaving the king's row.
+                occupiedAfter = occupied ^ (1 << sq) ^ (1 << epSq) ^ (1 << capturedSq)
+                if not self.attackersTo(kingSq, enemyColor, occupiedAfter) & ~(1 << capturedSq):
+                    moves.append(sq | epSq << 6 | MOVE_CAPTURE | MOVE_ENPASSANT)
+
+    def getCastleMovesBitboard(self, moves, kingSq, enemyColor, occupied):
+        """ Generate all possible castle moves for the king (not in check) and add moves to list of moves. """
+
+        kingSide, queenSide = (ChessEngine.WKS, ChessEngine.WQS) if self.whiteToMove else (ChessEngine.BKS, ChessEngine.BQS)
+        if self.castlingRights & kingSide:
+            if not occupied & (1 << (kingSq + 1) | 1 << (kingSq + 2)):
+                if not (self.attackersTo(kingSq + 1, enemyColor, occupied) or
+                        self.attackersTo(kingSq + 2, enemyColor, occupied)):
+                    moves.append(kingSq | (kingSq + 2) << 6 | MOVE_CASTLE)
+
+        if self.castlingRights & queenSide:
+            if not occupied & (1 << (kingSq - 1) | 1 << (kingSq - 2) | 1 << (kingSq - 3)):
+                if not (self.attackersTo(kingSq - 1, enemyColor, occupied) or
+                        self.attackersTo(kingSq - 2, enemyColor, occupied)):
+                    moves.append(kingSq | (kingSq - 2) << 6 | MOVE_CASTLE)
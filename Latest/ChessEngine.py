@@ -1,3 +1,44 @@
+import random
+import ChessEvaluation
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+FEN_PIECES = {char: ('w' if char.isupper() else 'b') + char.upper() for char in "PNBRQKpnbrqk"}
+PIECES_FEN = {piece: char for char, piece in FEN_PIECES.items()}
+EMPTY_RUNS = {str(n): ['--'] * n for n in range(1, 9)}
+
+# Castling rights are the bits of one int (also the index of ZOBRIST_CASTLING).
+WKS, WQS, BKS, BQS = 1, 2, 4, 8
+ALL_CASTLING = WKS | WQS | BKS | BQS
+# Rights kept when a piece moves from or to the square: moving a king or a rook (or capturing it) clears them.
+CASTLING_MASK = [ALL_CASTLING] * 64
+CASTLING_MASK[0], CASTLING_MASK[4], CASTLING_MASK[7] = ALL_CASTLING ^ BQS, ALL_CASTLING ^ (BKS | BQS), ALL_CASTLING ^ BKS
+CASTLING_MASK[56], CASTLING_MASK[60], CASTLING_MASK[63] = ALL_CASTLING ^ WQS, ALL_CASTLING ^ (WKS | WQS), ALL_CASTLING ^ WKS
+UNDO_STACK_SIZE = 256  # plies preallocated for the undo stack, it grows if a game gets longer
+
+zobristDebug = False   # Recomputes the zobrist key from scratch after every makeMove/undoMove and checks it.
+boardScoreDebug = False # Same for the material and position scores.
+
+def initZobristKeys():
+    """
+    Random 64-bit keys used to hash a position. See https://www.chessprogramming.org/Zobrist_Hashing
+    A fixed seed is used so every process (AI worker, perft, ...) gets the same keys.
+    """
+
+    rng = random.Random(2021)
+    pieceKeys = {color + piece: [rng.getrandbits(64) for sq in range(64)] for color in "wb" for piece in "PNBRQK"}
+    blackToMoveKey = rng.getrandbits(64)
+    castleKeys = [rng.getrandbits(64) for right in range(4)] # wks, wqs, bks, bqs
+    # one key per combination of castling rights so the 4 flags are updated with one XOR.
+    castleRightsKeys = [0] * 16
+    for i in range(16):
+        for right in range(4):
+            if i & (1 << right):
+                castleRightsKeys[i] ^= castleKeys[right]
+    enpassantKeys = [rng.getrandbits(64) for col in range(8)] # only the column is needed
+    return pieceKeys, blackToMoveKey, castleRightsKeys, enpassantKeys
+
+ZOBRIST_PIECES, ZOBRIST_BLACK_TO_MOVE, ZOBRIST_CASTLING, ZOBRIST_ENPASSANT = initZobristKeys()
+
 class GameState():
     """
     This class is responsible for storing all information about the current state of a game of chess.
@@ -5,194 +46,430 @@ class GameState():
     It will also keep a move log.
     """
 
-    def __init__(self) -> None:
+    def __init__(self, fen=START_FEN) -> None:
         # board is a 8x8 2d list. each element has 2 characters.
         # 1st character is color of piece "b" or "w"
         # 2nd is the type of piece "K", "Q", "R", "B", "N", "P"
         # "--" represents an empty space with no piece
-
-        self.board = [
-            ["bR", "bN", "bB", "bQ", "bK", "bB", "bN", "bR"],
-            ["bP", "bP", "bP", "bP", "bP", "bP", "bP", "bP"],
-            ["--", "--", "--", "--", "--", "--", "--", "--"],
-            ["--", "--", "--", "--", "--", "--", "--", "--"],
-            ["--", "--", "--", "--", "--", "--", "--", "--"],
-            ["--", "--", "--", "--", "--", "--", "--", "--"],
-            ["wP", "wP", "wP", "wP", "wP", "wP", "wP", "wP"],
-            ["wR", "wN", "wB", "wQ", "wK", "wB", "wN", "wR"]]
+        # The position comes from a FEN string: the start position by default.
+        # To test AI edge cases, set up your own position with GameState.fromFEN(fen).
 
         self.moveFunctions = {'P': self.getPawnMoves, 'R': self.getRookMoves,
                               'N': self.getKnightMoves, 'B': self.getBishopMoves,
                               'Q': self.getQueenMoves, 'K': self.getKingMoves}
-        self.whiteToMove = True
-        self.moveLog = []
-        self.whiteKingLocation = (7, 4) # used to monitor for checks
-        self.blackKingLocation = (0, 4) # used to monitor for checks
-        self.checkmate = False
-        self.stalemate = False
         self.inCheck = False
         self.pins = []
         self.checks = []
-        self.enpassantPossible = () # this will be the coordinate where en passant capture is possible.
-        self.enPassantPossibleLog = [self.enpassantPossible]
-        self.currentCastlingRight = CastleRights(True, True, True, True)
-        self.castleRightLog = [CastleRights(self.currentCastlingRight.wks,
-                                            self.currentCastlingRight.wqs,
-                                            self.currentCastlingRight.bks,
-                                            self.currentCastlingRight.bqs)]
+        self.loadFEN(fen) # board, side to move, king locations, castling, en passant, counters and the logs
+
+    @classmethod
+    def fromFEN(cls, fen):
+        """ A new game state set up from a FEN string. """
+
+        return cls(fen)
 
+    def loadFEN(self, fen):
+        """ 
+        Replaces the position with the one described by the FEN string and clears the move log.
+        See https://www.chessprogramming.org/Forsyth-Edwards_Notation
+        The board, zobrist key and scores are built in a single pass so thousands of positions load per second.
+        Missing trailing fields default to: w - - 0 1
         """
-        testing AI edge cases.
-        Uncomment this and set-up your own test case.
-        
-        self.board = [
-            ["bR", "--", "--", "--", "bK", "--", "--", "bR"],
-            ["bP", "bP", "bP", "--", "--", "bP", "bP", "bP"],
-            ["--", "--", "bN", "--", "--", "--", "--", "--"],
-            ["--", "--", "bB", "bP", "bP", "bB", "--", "--"],
-            ["--", "--", "--", "--", "bN", "--", "--", "--"],
-            ["--", "--", "--", "--", "--", "--", "bQ", "--"],
-            ["--", "--", "--", "--", "--", "--", "--", "wK"],
-            ["--", "--", "--", "--", "--", "--", "--", "--"]]
-        
-        self.currentCastlingRight = CastleRights(False, True, False, True) #while debugging
-        self.castleRightLog = [CastleRights(self.currentCastlingRight.wks,
-                                            self.currentCastlingRight.wqs,
-                                            self.currentCastlingRight.bks,
-                                            self.currentCastlingRight.bqs)]
+
+        self.startFEN = fen # with the move log, this is the whole game (see ChessWorker)
+        fields = fen.split()
+        board = []
+        zobristKey = 0
+        material = position = 0
+        for r, rank in enumerate(fields[0].split('/')):
+            row = []
+            for char in rank:
+                if char in '12345678':
+                    row.extend(EMPTY_RUNS[char])
+                    continue
+                piece = FEN_PIECES[char]
+                sq = r * 8 + len(row)
+                if piece[1] == 'K':
+                    if piece[0] == 'w':
+                        self.whiteKingLocation = (r, len(row))
+                    else:
+                        self.blackKingLocation = (r, len(row))
+                zobristKey ^= ZOBRIST_PIECES[piece][sq]
+                material += ChessEvaluation.materialScores[piece]
+                position += ChessEvaluation.positionScores[piece][sq]
+                row.append(piece)
+            board.append(row)
+        self.board = board
+
+        self.whiteToMove = len(fields) < 2 or fields[1] == 'w'
+        castling = fields[2] if len(fields) > 2 else '-'
+        self.castlingRights = ('K' in castling and WKS) | ('Q' in castling and WQS) | \
+                              ('k' in castling and BKS) | ('q' in castling and BQS)
+        if len(fields) > 3 and fields[3] != '-':
+            self.enpassantPossible = (Move.ranksToRows[fields[3][1]], Move.filesToCols[fields[3][0]])
+        else:
+            self.enpassantPossible = () # this will be the coordinate where en passant capture is possible.
+        self.halfmoveClock = int(fields[4]) if len(fields) > 4 else 0    # moves since the last capture or pawn move
+        self.fullmoveNumber = int(fields[5]) if len(fields) > 5 else 1   # starts at 1, incremented after black moves
+
+        self.moveLog = []       # the moves made with makeMove (Move objects), for the GUI and the notation
+        self.gamePly = 0        # moves made since the FEN: makeMove and the search's makeMoveID
+        # What makeMoveID cannot recompute on undo, one tuple per ply indexed by gamePly: (zobristKey, castlingRights,
+        # enpassantPossible, halfmoveClock) before the move, then the move and (pieceMoved, pieceCaptured).
+        self.undoStack = [None] * UNDO_STACK_SIZE
+        self.nullMoveStack = [] # (zobristKey, enpassantPossible, halfmoveClock) before each null move
+        self.priorKeys = ()     # zobrist keys of the positions played before this FEN, oldest first (see repetitions)
+        self.checkmate = False
+        self.stalemate = False
+        if not self.whiteToMove:
+            zobristKey ^= ZOBRIST_BLACK_TO_MOVE
+        zobristKey ^= ZOBRIST_CASTLING[self.castlingRights]
+        if self.enpassantPossible != ():
+            zobristKey ^= ZOBRIST_ENPASSANT[self.enpassantPossible[1]]
+        self.zobristKey = zobristKey
+        self.materialScore, self.positionScore = material, position # running totals, see updateBoardScore
+
+    def toFEN(self):
+        """ The FEN string of the current position. """
+
+        ranks = []
+        for row in self.board:
+            rank = ''
+            empty = 0
+            for piece in row:
+                if piece == '--':
+                    empty += 1
+                    continue
+                if empty:
+                    rank += str(empty)
+                    empty = 0
+                rank += PIECES_FEN[piece]
+            ranks.append(rank + str(empty) if empty else rank)
+
+        castling = ('K' if self.castlingRights & WKS else '') + ('Q' if self.castlingRights & WQS else '') + \
+                   ('k' if self.castlingRights & BKS else '') + ('q' if self.castlingRights & BQS else '')
+        if self.enpassantPossible != ():
+            enpassant = Move.colsToFiles[self.enpassantPossible[1]] + Move.rowsToRanks[self.enpassantPossible[0]]
+        else:
+            enpassant = '-'
+        return f"{'/'.join(ranks)} {'w' if self.whiteToMove else 'b'} {castling or '-'} {enpassant} " + \
+               f"{self.halfmoveClock} {self.fullmoveNumber}"
+
+    def computeZobristKey(self):
+        """ Computes the zobrist key of the current position from scratch. makeMove/undoMove keep it up to date. """
+
+        key = 0
+        board = self.board
+        for r in range(8):
+            for c in range(8):
+                if board[r][c] != '--':
+                    key ^= ZOBRIST_PIECES[board[r][c]][r * 8 + c]
+        if not self.whiteToMove:
+            key ^= ZOBRIST_BLACK_TO_MOVE
+        key ^= ZOBRIST_CASTLING[self.castlingRights]
+        if self.enpassantPossible != ():
+            key ^= ZOBRIST_ENPASSANT[self.enpassantPossible[1]]
+        return key
+
+    def computeBoardScore(self):
+        """ 
+        Computes (material, position) scores of the current position from scratch, in centipawns.
+        Positive is good for white. makeMove/undoMove keep them up to date.
         """
-                                                    
+
+        material = position = 0
+        board = self.board
+        for r in range(8):
+            for c in range(8):
+                piece = board[r][c]
+                if piece != '--':
+                    material += ChessEvaluation.materialScores[piece]
+                    position += ChessEvaluation.positionScores[piece][r * 8 + c]
+        return material, position
+
     def makeMove(self, move):
         """ Takes a move as a parameter and executes it. """
 
-        self.board[move.startRow][move.startCol] = '--'
-        self.board[move.endRow][move.endCol] = move.pieceMoved
+        self.makeMoveID(move.moveID)
         self.moveLog.append(move) # Log the move for display and/or undo
+
+    def makeMoveID(self, move):
+        """ 
+        Executes the move given by its moveID (see Move). The search makes its moves this way, no Move object is
+        needed. Not in the moveLog: undo it with undoMoveID.
+        """
+
+        ply = self.gamePly
+        oldCastleRights = self.castlingRights
+        oldEnpassant = self.enpassantPossible
+        pieceMoved, pieceCaptured = self.movePieces(move)
+        undo = (self.zobristKey, oldCastleRights, oldEnpassant, self.halfmoveClock, move, pieceMoved, pieceCaptured)
+        if ply < len(self.undoStack):
+            self.undoStack[ply] = undo
+        else:
+            self.undoStack.append(undo)
+        self.gamePly = ply + 1
         self.whiteToMove = not self.whiteToMove # Switch player to play
 
+        start = move & 63
+        end = move >> 6 & 63
         # update kings position if they moved
-        if move.pieceMoved == 'wK': 
-            self.whiteKingLocation = (move.endRow, move.endCol)
-        elif move.pieceMoved == 'bK':
-            self.blackKingLocation = (move.endRow, move.endCol)
-
-        # pawn promotion
-        if move.isPawnPromotion:
-            self.board[move.endRow][move.endCol] = move.pieceMoved[0]+'Q'
-
-        # enpassant move
-        if move.isEnpassantMove:
-            self.board[move.startRow][move.endCol] = '--' # remove the captured pawn
-        
+        if pieceMoved == 'wK':
+            self.whiteKingLocation = (end >> 3, end & 7)
+        elif pieceMoved == 'bK':
+            self.blackKingLocation = (end >> 3, end & 7)
+
         #update enpassantPossible variable.Stores the square of possible enpassant
-        if move.pieceMoved[1] == 'P' and abs(move.startRow - move.endRow) == 2:
-            self.enpassantPossible = ((move.startRow + move.endRow)//2, move.endCol)
+        if pieceMoved[1] == 'P' and (end - start == 16 or start - end == 16):
+            self.enpassantPossible = ((start + end) >> 4, end & 7)
         else:
             self.enpassantPossible = ()
 
-        # Update enPassant Log
-        self.enPassantPossibleLog.append(self.enpassantPossible)
+        # 50 move rule counter and move number
+        if pieceMoved[1] == 'P' or pieceCaptured != '--':
+            self.halfmoveClock = 0
+        else:
+            self.halfmoveClock += 1
+        if self.whiteToMove: # black just moved
+            self.fullmoveNumber += 1
+
+        # update castling rights - whenever it is a rook or king move.
+        self.updateCastleRights(move)
+
+        self.updateZobristKey(move, pieceMoved, pieceCaptured, oldCastleRights, oldEnpassant)
+        if zobristDebug:
+            assert self.zobristKey == self.computeZobristKey(), \
+                "zobrist key out of sync after " + coordinateNotation(move)
+        self.updateBoardScore(move, pieceMoved, pieceCaptured, 1)
+        if boardScoreDebug:
+            assert (self.materialScore, self.positionScore) == self.computeBoardScore(), \
+                "score out of sync after " + coordinateNotation(move)
+
+    def movePieces(self, move):
+        """ 
+        Moves the pieces of a move (a moveID) on the board: the piece moved (promoted if needed), the piece captured
+        and the rook of a castle. Returns (pieceMoved, pieceCaptured). makeMoveID updates the rest of the position.
+        """
+
+        board = self.board
+        startRow, startCol = move >> 3 & 7, move & 7
+        endRow, endCol = move >> 9 & 7, move >> 6 & 7
+        pieceMoved = board[startRow][startCol]
+        if move & MOVE_ENPASSANT:
+            pieceCaptured = board[startRow][endCol]
+            board[startRow][endCol] = '--' # remove the captured pawn
+        else:
+            pieceCaptured = board[endRow][endCol]
+        board[startRow][startCol] = '--'
+        board[endRow][endCol] = pieceMoved[0] + 'Q' if move & MOVE_PROMOTION else pieceMoved
 
         # Castling move. Note that the king will already have moved per code above.
-        if move.isCastleMove:
-            if (move.endCol - move.startCol) == 2: # King side castle
-                self.board[move.endRow][move.endCol - 1] = self.board[move.endRow][move.endCol + 1] #copies the rook
-                self.board[move.endRow][move.endCol + 1] = '--'
+        if move & MOVE_CASTLE:
+            if endCol == 6: # King side castle
+                board[endRow][5] = board[endRow][7] #copies the rook
+                board[endRow][7] = '--'
             else:   # queen side castle
-                self.board[move.endRow][move.endCol + 1] = self.board[move.endRow][move.endCol - 2] #copies the rook
-                self.board[move.endRow][move.endCol - 2] = '--'
+                board[endRow][3] = board[endRow][0] #copies the rook
+                board[endRow][0] = '--'
+        return pieceMoved, pieceCaptured
 
-        # update castling rights - whenever it is a rook or king move.
-        self.updateCastleRights(move)
-        self.castleRightLog.append(CastleRights(self.currentCastlingRight.wks,
-                                                self.currentCastlingRight.wqs,
-                                                self.currentCastlingRight.bks,
-                                                self.currentCastlingRight.bqs))
+    def makeNullMove(self):
+        """ 
+        Passes the turn, for null-move pruning (see ChessAI). Only the side to move, the en passant square and 
+        the zobrist key change, the board does not. Not in the moveLog: undo it with undoNullMove.
+        The 50 move counter restarts: positions before a null move are not repeated by the moves after it.
+        """
+
+        self.nullMoveStack.append((self.zobristKey, self.enpassantPossible, self.halfmoveClock))
+        self.halfmoveClock = 0
+        key = self.zobristKey ^ ZOBRIST_BLACK_TO_MOVE
+        if self.enpassantPossible != ():
+            key ^= ZOBRIST_ENPASSANT[self.enpassantPossible[1]]
+        self.zobristKey = key
+        self.enpassantPossible = ()
+        self.whiteToMove = not self.whiteToMove
+
+    def undoNullMove(self):
+        """ Undo the last makeNullMove. """
+
+        self.zobristKey, self.enpassantPossible, self.halfmoveClock = self.nullMoveStack.pop()
+        self.whiteToMove = not self.whiteToMove
+
+    def repetitions(self):
+        """ 
+        How many times the current position was reached before. Only the positions since the last capture or pawn 
+        move (halfmoveClock) can repeat it: their keys are in the undoStack, then in priorKeys.
+        """
+
+        key = self.zobristKey
+        ply = self.gamePly
+        count = 0
+        for back in range(4, self.halfmoveClock + 1, 2): # same side to move, a position 2 plies back can't repeat
+            if back <= ply:
+                if self.undoStack[ply - back][0] == key:
+                    count += 1
+            elif back - ply <= len(self.priorKeys):
+                if self.priorKeys[ply - back] == key:
+                    count += 1
+            else:
+                break
+        return count
+
+    def isThreefoldRepetition(self):
+        """ The current position occurred for the third time: the game is drawn. """
+
+        return self.repetitions() >= 2
+
+    def positionHistory(self):
+        """ Keys of the positions since the last capture or pawn move, oldest first. See priorKeys. """
+
+        keys = list(self.priorKeys) + [undo[0] for undo in self.undoStack[:self.gamePly]]
+        return keys[len(keys) - min(self.halfmoveClock, len(keys)):]
+
+    def hasNonPawnMaterial(self, white):
+        """ True if the side has a piece other than its king and pawns. Zugzwang is likely without one. """
+
+        color = 'w' if white else 'b'
+        for row in self.board:
+            for square in row:
+                if square[0] == color and square[1] not in 'PK':
+                    return True
+        return False
+
+    def updateBoardScore(self, move, pieceMoved, pieceCaptured, sign):
+        """ 
+        Adds (sign = 1, makeMoveID) or removes (sign = -1, undoMoveID) the score change of a move (a moveID):
+        the moved piece leaves its square, arrives (maybe promoted), the captured piece and castled rook.
+        """
+
+        materialScores = ChessEvaluation.materialScores
+        positionScores = ChessEvaluation.positionScores
+        start = move & 63
+        end = move >> 6 & 63
+        finalPiece = pieceMoved[0] + 'Q' if move & MOVE_PROMOTION else pieceMoved
+        material = materialScores[finalPiece] - materialScores[pieceMoved]
+        position = positionScores[finalPiece][end] - positionScores[pieceMoved][start]
+
+        if pieceCaptured != '--':
+            captureSq = (start & 56) | (end & 7) if move & MOVE_ENPASSANT else end
+            material -= materialScores[pieceCaptured]
+            position -= positionScores[pieceCaptured][captureSq]
+
+        if move & MOVE_CASTLE:
+            rookScores = positionScores[pieceMoved[0] + 'R']
+            rowStart = end & 56
+            if end & 7 == 6: # King side castle
+                position += rookScores[rowStart + 5] - rookScores[rowStart + 7]
+            else:   # queen side castle
+                position += rookScores[rowStart + 3] - rookScores[rowStart]
+
+        self.materialScore += sign * material
+        self.positionScore += sign * position
+
+    def updateZobristKey(self, move, pieceMoved, pieceCaptured, oldCastleRights, oldEnpassant):
+        """ XOR in/out everything the move (a moveID) changed: pieces, side to move, castling rights and en passant. """
+
+        start = move & 63
+        end = move >> 6 & 63
+        key = self.zobristKey ^ ZOBRIST_BLACK_TO_MOVE
+        key ^= ZOBRIST_PIECES[pieceMoved][start]
+        key ^= ZOBRIST_PIECES[pieceMoved[0] + 'Q' if move & MOVE_PROMOTION else pieceMoved][end]
+
+        if pieceCaptured != '--':
+            captureSq = (start & 56) | (end & 7) if move & MOVE_ENPASSANT else end
+            key ^= ZOBRIST_PIECES[pieceCaptured][captureSq]
+
+        if move & MOVE_CASTLE:
+            rookKeys = ZOBRIST_PIECES[pieceMoved[0] + 'R']
+            rowStart = end & 56
+            if end & 7 == 6: # King side castle
+                key ^= rookKeys[rowStart + 7] ^ rookKeys[rowStart + 5]
+            else:   # queen side castle
+                key ^= rookKeys[rowStart] ^ rookKeys[rowStart + 3]
+
+        key ^= ZOBRIST_CASTLING[oldCastleRights] ^ ZOBRIST_CASTLING[self.castlingRights]
+        if oldEnpassant != ():
+            key ^= ZOBRIST_ENPASSANT[oldEnpassant[1]]
+        if self.enpassantPossible != ():
+            key ^= ZOBRIST_ENPASSANT[self.enpassantPossible[1]]
+        self.zobristKey = key
     
     def undoMove(self):
         """ This function will undo the last move. """
 
         if len(self.moveLog) != 0: # Make sure that there is a move to undo.
-            move = self.moveLog.pop()
-            self.board[move.startRow][move.startCol] = move.pieceMoved
-            self.board[move.endRow][move.endCol] = move.pieceCaptured
-            self.whiteToMove = not self.whiteToMove
-
-            #update the king locations
-            if move.pieceMoved == 'wK': 
-                self.whiteKingLocation = (move.startRow, move.startCol)
-            elif move.pieceMoved == 'bK':
-                self.blackKingLocation = (move.startRow, move.startCol)
-
-            #undo enpassant
-            if move.isEnpassantMove:
-                self.board[move.endRow][move.endCol] = '--' # Clear previous End position
-                self.board[move.startRow][move.endCol] = move.pieceCaptured
-            self.enPassantPossibleLog.pop()
-            self.enpassantPossible = self.enPassantPossibleLog[-1]
-
-            # undo castling rights
-            self.castleRightLog.pop()
-            self.currentCastlingRight = CastleRights(self.castleRightLog[-1].wks,
-                                            self.castleRightLog[-1].wqs,
-                                            self.castleRightLog[-1].bks,
-                                            self.castleRightLog[-1].bqs)
-
-            # undo castle move
-            if move.isCastleMove:
-                if (move.endCol - move.startCol) == 2: # King side castle
-                    self.board[move.endRow][move.endCol+1] = self.board[move.endRow][move.endCol-1] #copies the rook
-                    self.board[move.endRow][move.endCol-1] = '--'
-                else:   # queen side castle
-                    self.board[move.endRow][move.endCol-2] = self.board[move.endRow][move.endCol+1] #copies the rook
-                    self.board[move.endRow][move.endCol+1] = '--'
+            self.moveLog.pop()
+            self.undoMoveID()
 
         self.stalemate = False
         self.checkmate = False
 
+    def undoMoveID(self):
+        """ Undo the last makeMoveID. """
+
+        ply = self.gamePly - 1
+        self.gamePly = ply
+        # restore the key, castling rights, en passant square and 50 move counter
+        self.zobristKey, self.castlingRights, self.enpassantPossible, self.halfmoveClock, move, pieceMoved, \
+            pieceCaptured = self.undoStack[ply]
+        self.unmovePieces(move, pieceMoved, pieceCaptured)
+        self.whiteToMove = not self.whiteToMove
+        if not self.whiteToMove: # undoing a black move
+            self.fullmoveNumber -= 1
+
+        #update the king locations
+        if pieceMoved == 'wK':
+            self.whiteKingLocation = (move >> 3 & 7, move & 7)
+        elif pieceMoved == 'bK':
+            self.blackKingLocation = (move >> 3 & 7, move & 7)
+
+        if zobristDebug:
+            assert self.zobristKey == self.computeZobristKey(), "zobrist key out of sync after undo of " + \
+                coordinateNotation(move)
+        self.updateBoardScore(move, pieceMoved, pieceCaptured, -1)
+        if boardScoreDebug:
+            assert (self.materialScore, self.positionScore) == self.computeBoardScore(), \
+                "score out of sync after undo of " + coordinateNotation(move)
+        self.stalemate = False
+        self.checkmate = False
+
+    def unmovePieces(self, move, pieceMoved, pieceCaptured):
+        """ Opposite of movePieces: puts the pieces of the move back where they were. """
+
+        board = self.board
+        startRow, startCol = move >> 3 & 7, move & 7
+        endRow, endCol = move >> 9 & 7, move >> 6 & 7
+        board[startRow][startCol] = pieceMoved
+        if move & MOVE_ENPASSANT:
+            board[endRow][endCol] = '--' # Clear previous End position
+            board[startRow][endCol] = pieceCaptured
+        else:
+            board[endRow][endCol] = pieceCaptured
+
+        # undo castle move
+        if move & MOVE_CASTLE:
+            if endCol == 6: # King side castle
+                board[endRow][7] = board[endRow][5] #copies the rook
+                board[endRow][5] = '--'
+            else:   # queen side castle
+                board[endRow][0] = board[endRow][3] #copies the rook
+                board[endRow][3] = '--'
+
     def updateCastleRights(self, move):
-        """ Update Castling rights after moving rooks and kings. """
-
-        # if a king moves
-        if move.pieceMoved == 'wK':
-            self.currentCastlingRight.wks = False
-            self.currentCastlingRight.wqs = False
-        elif move.pieceMoved == 'bK':
-            self.currentCastlingRight.bks = False
-            self.currentCastlingRight.bqs = False
-
-        # if a rook moves
-        elif move.pieceMoved == 'wR':
-            if move.startRow == 7:
-                if move.startCol == 0:
-                    self.currentCastlingRight.wqs = False
-                else:
-                    move.startCol == 7 
-                    self.currentCastlingRight.wks = False
-        elif move.pieceMoved == 'BR':
-            if move.startRow == 7:
-                if move.startCol == 0:
-                    self.currentCastlingRight.bqs = False
-                else:
-                    move.startCol == 7 
-                    self.currentCastlingRight.bks = False
-
-        # if a rook is captured
-        if move.pieceCaptured == 'wR':
-                if move.endRow == 7:
-                    if move.endCol == 0:
-                        self.currentCastlingRight.wqs = False
-                    elif move.endCol == 7:
-                        self.currentCastlingRight.wks = False
-        elif move.pieceCaptured == 'bR':
-                if move.endRow == 7:
-                    if move.endCol == 0:
-                        self.currentCastlingRight.bqs = False
-                    elif move.endCol == 7:
-                        self.currentCastlingRight.bks = False
+        """ 
+        Update Castling rights after moving rooks and kings, or capturing a rook.
+        Only the king and rook start squares clear rights, see CASTLING_MASK.
+        """
+
+        self.castlingRights &= CASTLING_MASK[move & 63] & CASTLING_MASK[move >> 6 & 63]
 
     def getValidMoves(self):
-        """ All moves considering checks. """
+        """ All moves considering checks, as Move objects for the GUI and the notation. """
+
+        return [self.toMove(move) for move in self.getValidMoveIDs()]
+
+    def getValidMoveIDs(self):
+        """ All moves considering checks, as moveIDs (see Move). """
 
         moves = []
         self.inCheck, self.pins, self.checks = self.checkForPinsAndChecks()
@@ -217,25 +494,20 @@ class GameState():
 
                 #if Knight, must capture knight or move king.
                 if pieceChecking[1] == 'N':
-                    validSquares = [(checkRow, checkCol)] # Add capturing the knight to valid Squares
+                    validSquares = [checkRow * 8 + checkCol] # Add capturing the knight to valid Squares
                 else: 
                     for i in range (1, 8):
                         validSquare = (kingRow + check[2] * i, kingCol + check[3] * i) # Check[2] and Check [3] are the check directions
-                        validSquares.append(validSquare)
+                        validSquares.append(validSquare[0] * 8 + validSquare[1])
                         if validSquare[0] == checkRow and validSquare[1] == checkCol:  # This is the piece making the check
                             break
                 
-                # Remove all moves that do not block check or move king.
-                for i in range (len(moves) -1, -1, -1):
-                    if moves[i].pieceMoved[1] !='K':
-                        if not (moves[i].endRow, moves[i].endCol) in validSquares: # move does not block check or capture checking piece
-                            if moves[i].isEnpassantMove:
-                                capturedCol = moves[i].endCol
-                                capturedRow = moves[i].endRow + 1 if self.whiteToMove else moves[i].endRow-1
-                                if not (capturedRow,capturedCol) in validSquares:
-                                        moves.remove(moves[i])
-                            else:
-                                moves.remove(moves[i])
+                # Keep only the moves that block check, capture the checking piece or move the king.
+                # (one pass building a new list: removing from the list one move at a time was O(n^2))
+                kingSq = kingRow * 8 + kingCol
+                capturedOffset = 8 if self.whiteToMove else -8 # en passant captures the pawn behind the end square
+                moves = [move for move in moves if move & 63 == kingSq or (move >> 6 & 63) in validSquares or
+                         (move & MOVE_ENPASSANT and (move >> 6 & 63) + capturedOffset in validSquares)]
 
             else: # double check, king has to move
                 self.getKingMoves(kingRow, kingCol, moves)
@@ -250,8 +522,191 @@ class GameState():
                 self.stalemate = True
         return moves
 
-    def getAllPossibleMoves(self):
-        """ All possible moves. """
+    def getCaptureMoveIDs(self):
+        """ 
+        Only the captures and promotions among the valid moves. Used by the quiescence search.
+        When in check all the valid moves are returned since every evasion has to be looked at.
+        """
+
+        self.inCheck, self.pins, self.checks = self.checkForPinsAndChecks()
+        if self.inCheck:
+            return self.getValidMoveIDs()
+        return self.getAllPossibleMoves(capturesOnly=True)
+
+    def getPseudoLegalMoveIDs(self, capturesOnly=False):
+        """ 
+        All moves ignoring checks and pins, so some may leave the king in check. Much cheaper than getValidMoveIDs
+        when most moves are never searched (alpha-beta cutoffs). The search tests each move with isLegal
+        (or makeMoveID + isKingAttacked) only when it gets to it. Also sets self.inCheck.
+        With capturesOnly, only captures and promotions (even when in check).
+        """
+
+        self.inCheck = self.isInCheck()
+        self.pins = [] # nothing is pinned as far as the move functions know
+        moves = []
+        for r in range(len(self.board)):
+            for c in range(len(self.board[r])):
+                turn = self.board[r][c][0]
+                if (turn == 'w' and self.whiteToMove) or (turn == 'b' and not self.whiteToMove):
+                    piece = self.board[r][c][1]
+                    if piece == 'K':
+                        self.getKingMovesPseudoLegal(r, c, moves, capturesOnly)
+                    else:
+                        self.moveFunctions[piece](r, c, moves, capturesOnly)
+        return moves
+
+    def getQuietMoveIDs(self):
+        """ Pseudo-legal moves that are neither captures nor promotions: the last stage of getMoveIDsStaged. """
+
+        return [move for move in self.getPseudoLegalMoveIDs() if not move & (MOVE_CAPTURE | MOVE_PROMOTION)]
+
+    def findPseudoLegalMove(self, moveID):
+        """ 
+        moveID if it is a pseudo-legal move in the current position, else None.
+        Only the moves of the piece on the start square are generated. Used for hash moves and killers.
+        """
+
+        startRow, startCol = divmod(moveID & 63, 8)
+        piece = self.board[startRow][startCol]
+        if piece[0] != ('w' if self.whiteToMove else 'b'):
+            return None
+        moves = []
+        if piece[1] == 'K':
+            self.getKingMovesPseudoLegal(startRow, startCol, moves)
+        else:
+            self.moveFunctions[piece[1]](startRow, startCol, moves)
+        return moveID if moveID in moves else None
+
+    def getMoveIDsStaged(self, hashMoveID=None, killerIDs=(), orderMoves=None):
+        """ 
+        Pseudo-legal moves, generated one stage at a time as the caller asks for them:
+            1) the hash move  2) captures and promotions  3) the killer moves  4) the other quiet moves
+        After a beta cutoff on an early stage, the later stages are never generated.
+        orderMoves(moves) is called to sort the captures and the quiet moves. Sets self.inCheck right away.
+        """
+
+        self.inCheck = self.isInCheck()
+        self.pins = [] # nothing is pinned as far as the move functions know
+        return self.generateStages(hashMoveID, killerIDs, orderMoves)
+
+    def generateStages(self, hashMoveID, killerIDs, orderMoves):
+        """ The generator behind getMoveIDsStaged. """
+
+        if hashMoveID is not None and self.findPseudoLegalMove(hashMoveID) is not None:
+            yield hashMoveID
+
+        captures = self.getPseudoLegalMoveIDs(capturesOnly=True)
+        if orderMoves is not None:
+            orderMoves(captures)
+        for move in captures:
+            if move != hashMoveID:
+                yield move
+
+        searchedIDs = [hashMoveID]
+        for killerID in killerIDs:
+            if killerID is not None and killerID not in searchedIDs and \
+                not killerID & (MOVE_CAPTURE | MOVE_PROMOTION) and self.findPseudoLegalMove(killerID) is not None:
+                searchedIDs.append(killerID)
+                yield killerID
+
+        quiets = self.getQuietMoveIDs()
+        if orderMoves is not None:
+            orderMoves(quiets)
+        for move in quiets:
+            if move not in searchedIDs:
+                yield move
+
+    def isLegal(self, move):
+        """ True if the (pseudo-legal) move, a moveID, does not leave the king of the side moving in check. """
+
+        self.makeMoveID(move)
+        legal = not self.isKingAttacked(not self.whiteToMove)
+        self.undoMoveID()
+        return legal
+
+    def pieceAt(self, sq):
+        """ The piece on the square (row * 8 + col), '--' if empty. """
+
+        return self.board[sq >> 3][sq & 7]
+
+    def capturedPiece(self, move):
+        """ The piece captured by the move (a moveID) in the current position, '--' if none. """
+
+        if move & MOVE_ENPASSANT:
+            return 'bP' if self.whiteToMove else 'wP'
+        return self.pieceAt(move >> 6 & 63)
+
+    def toMove(self, moveID):
+        """ The Move object of a moveID in the current position, for the GUI and the notation. """
+
+        return Move.fromMoveID(moveID, self.pieceAt(moveID & 63), self.capturedPiece(moveID))
+
+    def lineToMoves(self, moveIDs):
+        """ Move objects for a line of moveIDs played from the current position, e.g. the best line of a search. """
+
+        moves = []
+        for moveID in moveIDs:
+            moves.append(self.toMove(moveID))
+            self.makeMoveID(moveID)
+        for moveID in moveIDs:
+            self.undoMoveID()
+        return moves
+
+    def lastMoves(self, count):
+        """ The last count moves made (makeMove or makeMoveID) as Move objects, oldest first. Used by the tracer. """
+
+        return [Move.fromMoveID(*self.undoStack[ply][4:]) for ply in range(max(self.gamePly - count, 0), self.gamePly)]
+
+    def isInCheck(self):
+        """ Fast check test for the side to move. """
+
+        return self.isKingAttacked(self.whiteToMove)
+
+    def isKingAttacked(self, white):
+        """ 
+        Fast check test: is the king of the given color attacked?
+        Same scan as checkForPinsAndChecks but it stops at the first attacker and does not look for pins.
+        """
+
+        if white:
+            enemyColor = 'b'
+            kingRow, kingCol = self.whiteKingLocation
+        else:
+            enemyColor = 'w'
+            kingRow, kingCol = self.blackKingLocation
+
+        directions = ((-1, 0), (0,-1), (1, 0), (0, 1),      # These are rows
+                      (-1, -1), (-1, 1), (1, -1), (1, 1))   # These are diagonals
+        for j in range(len(directions)):
+            d = directions[j]
+            for i in range(1, 8):
+                endRow = kingRow + d[0] * i
+                endCol = kingCol + d[1] * i
+                if not (0 <= endRow < 8 and 0 <= endCol < 8):
+                    break
+                endPiece = self.board[endRow][endCol]
+                if endPiece == '--':
+                    continue
+                if endPiece[0] == enemyColor:
+                    pieceType = endPiece[1]
+                    if (j <= 3 and (pieceType == 'R' or pieceType == 'Q')) or \
+                        (j >= 4 and (pieceType == 'B' or pieceType == 'Q')) or \
+                        (i == 1 and pieceType == 'K') or \
+                        (i == 1 and pieceType == 'P' and ((enemyColor == "w" and 6 <= j <= 7) or \
+                                                          (enemyColor == "b" and 4 <= j <= 5))):
+                        return True
+                break # any other piece blocks this direction
+
+        knightMoves = ((-2 , -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1))
+        for m in knightMoves:
+            endRow = kingRow + m[0]
+            endCol = kingCol + m[1]
+            if 0 <= endRow < 8 and 0 <= endCol < 8 and self.board[endRow][endCol] == enemyColor + 'N':
+                return True
+        return False
+
+    def getAllPossibleMoves(self, capturesOnly=False):
+        """ All possible moves. With capturesOnly, only captures and promotions. """
 
         moves = []
         for r in range(len(self.board)):            # Number of rows
@@ -259,7 +714,7 @@ class GameState():
                 turn = self.board[r][c][0]          # Turn is the 'color' of the piece on the square
                 if (turn == 'w' and self.whiteToMove) or (turn == 'b' and not self.whiteToMove):
                     piece = self.board[r][c][1]
-                    self.moveFunctions[piece](r, c, moves)
+                    self.moveFunctions[piece](r, c, moves, capturesOnly)
         return moves
 
     def checkForPinsAndChecks(self):
@@ -331,7 +786,7 @@ class GameState():
         return inCheck, pins, checks
 
 
-    def getPawnMoves(self, r, c, moves):
+    def getPawnMoves(self, r, c, moves, capturesOnly=False):
         """ Get all the pawn moves for the pawn located at row, col and add these moves to the list. """
 
         piecePinned = False
@@ -354,17 +809,21 @@ class GameState():
             enemyColor = 'w'
             kingRow, kingCol = self.blackKingLocation
 
-        if self.board[r + moveAmount][c] == '--':                        # Check for 1 square advance
+        promotionRow = 0 if self.whiteToMove else 7
+        start = r * 8 + c
+        end = start + 8 * moveAmount # square in front of the pawn
+        promotion = MOVE_PROMOTION if r + moveAmount == promotionRow else 0
+        if self.board[r + moveAmount][c] == '--' and (not capturesOnly or promotion): # 1 square advance
             if not piecePinned or pinDirection == (moveAmount, 0):
-                moves.append(Move((r, c),(r + moveAmount, c), self.board))
+                moves.append(start | end << 6 | promotion)
                 if (r == startRow) and self.board[r + 2 * moveAmount][c] == '--': # Check for 2 square advance
-                    moves.append(Move((r, c), (r + 2 * moveAmount, c), self.board))
+                    moves.append(start | (end + 8 * moveAmount) << 6)
                     
         # Pawn captures
         if c - 1 >= 0:  # Capture to the left 
             if not piecePinned or pinDirection == (moveAmount, -1):
                 if self.board[r + moveAmount][c - 1][0] == enemyColor:
-                    moves.append(Move((r, c), (r + moveAmount, c - 1), self.board))
+                    moves.append(start | (end - 1) << 6 | MOVE_CAPTURE | promotion)
 
                 if (r + moveAmount, c - 1) == self.enpassantPossible:                   
                     # This ensures that we do not expose king to check after enpassant capture. 
@@ -379,19 +838,20 @@ class GameState():
                         for i in insideRange:
                             if self.board[r][i] != '--':
                                 blockingPiece = True
-                        for i in outsideRange:
+                        for i in outsideRange: # only the first piece found can attack the king
                             tempSq = self.board[r][i]
                             if tempSq[0] == enemyColor and (tempSq[1] == "R" or tempSq[1] == "Q"):
                                 attackingPiece = True
+                                break
                             elif tempSq != '--': 
-                                blockingPiece = True                            
+                                break
                     if not attackingPiece or blockingPiece:
-                        moves.append(Move((r , c),(r + moveAmount, c - 1), self.board, isEnpassantMove=True))
+                        moves.append(start | (end - 1) << 6 | MOVE_CAPTURE | MOVE_ENPASSANT)
 
         if c + 1 <= 7: # Capture to the right
             if not piecePinned or pinDirection == (moveAmount, 1):
                 if self.board[r + moveAmount][c + 1][0] == enemyColor:
-                    moves.append(Move((r , c),(r + moveAmount, c + 1), self.board))
+                    moves.append(start | (end + 1) << 6 | MOVE_CAPTURE | promotion)
                 if (r + moveAmount, c + 1) == self.enpassantPossible:
                     # check for not to expose king to check after enpassant capture
                     attackingPiece = blockingPiece = False
@@ -405,16 +865,17 @@ class GameState():
                         for i in insideRange:
                             if self.board[r][i] != '--':
                                 blockingPiece = True
-                        for i in outsideRange:
+                        for i in outsideRange: # only the first piece found can attack the king
                             tempSq = self.board[r][i]
                             if tempSq[0] == enemyColor and (tempSq[1] == "R" or tempSq[1] == "Q"):
                                 attackingPiece = True
+                                break
                             elif tempSq != '--': 
-                                blockingPiece = True                            
+                                break
                     if not attackingPiece or blockingPiece:
-                        moves.append(Move((r , c),(r + moveAmount, c + 1), self.board, isEnpassantMove=True))
+                        moves.append(start | (end + 1) << 6 | MOVE_CAPTURE | MOVE_ENPASSANT)
 
-    def getRookMoves(self, r, c, moves):
+    def getRookMoves(self, r, c, moves, capturesOnly=False):
         """ Get all the Rook moves for the Rook located at row, col and add these moves to the list. """ 
 
         piecePinned = False
@@ -438,16 +899,17 @@ class GameState():
                     if not piecePinned or pinDirection == d or pinDirection == (-d[0], -d[1]):
                         endPiece = self.board[endRow][endCol]
                         if endPiece == '--':
-                            moves.append(Move((r, c), (endRow, endCol), self.board))
+                            if not capturesOnly:
+                                moves.append(r * 8 + c | (endRow * 8 + endCol) << 6)
                         elif endPiece[0] == enemyColor:
-                            moves.append(Move((r, c), (endRow, endCol), self.board))
+                            moves.append(r * 8 + c | (endRow * 8 + endCol) << 6 | MOVE_CAPTURE)
                             break
                         else: #friendly piece, move is not possible.
                             break
                 else: # off board
                     break
 
-    def getKnightMoves(self, r, c, moves):
+    def getKnightMoves(self, r, c, moves, capturesOnly=False):
         """ Get all the Knight moves for the Knight located at row, col and add these moves to the list. """
 
         piecePinned = False
@@ -467,10 +929,10 @@ class GameState():
             if 0 <= endRow < 8 and 0 <= endCol < 8: # on board
                 if not piecePinned:
                     endPiece = self.board[endRow][endCol]
-                    if endPiece[0] != allyColor:
-                        moves.append(Move((r, c), (endRow, endCol), self.board))
+                    if endPiece[0] != allyColor and (not capturesOnly or endPiece != '--'):
+                        moves.append(r * 8 + c | (endRow * 8 + endCol) << 6 | (MOVE_CAPTURE if endPiece != '--' else 0))
          
-    def getBishopMoves(self, r, c, moves):
+    def getBishopMoves(self, r, c, moves, capturesOnly=False):
         """ Get all the Bishop moves for the Bishop located at row, col and add these moves to the list. """
 
         piecePinned = False
@@ -492,22 +954,23 @@ class GameState():
                     if not piecePinned or pinDirection == d or pinDirection == (-d[0], -d[1]):
                         endPiece = self.board[endRow][endCol]
                         if endPiece == '--':
-                            moves.append(Move((r, c), (endRow, endCol), self.board))
+                            if not capturesOnly:
+                                moves.append(r * 8 + c | (endRow * 8 + endCol) << 6)
                         elif endPiece[0] == enemyColor:
-                            moves.append(Move((r, c), (endRow, endCol), self.board))
+                            moves.append(r * 8 + c | (endRow * 8 + endCol) << 6 | MOVE_CAPTURE)
                             break
                         else: 
                             break
                 else: 
                     break
 
-    def getQueenMoves(self, r, c, moves):
+    def getQueenMoves(self, r, c, moves, capturesOnly=False):
         """ Get all the Queen moves for the Queen located at row, col and add these moves to the list. """
 
-        self.getRookMoves(r,c, moves)
-        self.getBishopMoves(r,c, moves)
+        self.getRookMoves(r,c, moves, capturesOnly)
+        self.getBishopMoves(r,c, moves, capturesOnly)
 
-    def getKingMoves(self, r, c, moves):
+    def getKingMoves(self, r, c, moves, capturesOnly=False):
         """ Get all the King moves for the King located at row, col and add these moves to the list. """
 
         rowMoves = (-1, -1, -1, 0, 0, 1, 1, 1)
@@ -518,7 +981,7 @@ class GameState():
             endCol = c + colMoves[i]           
             if 0 <= endRow < 8 and 0 <= endCol < 8: # on board
                endPiece = self.board[endRow][endCol]
-               if endPiece[0] != allyColor: # empty or enemy piece
+               if endPiece[0] != allyColor and (not capturesOnly or endPiece != '--'): # empty or enemy piece
                 # place king and check for checks
                 if allyColor == 'w':
                     self.whiteKingLocation = (endRow, endCol)
@@ -526,7 +989,7 @@ class GameState():
                     self.blackKingLocation = (endRow, endCol)
                 inCheck, pins, checks = self.checkForPinsAndChecks()
                 if not inCheck:
-                    moves.append(Move((r, c), (endRow, endCol), self.board))
+                    moves.append(r * 8 + c | (endRow * 8 + endCol) << 6 | (MOVE_CAPTURE if endPiece != '--' else 0))
 
                 # place king back on its original location
                 if allyColor == 'w':
@@ -534,22 +997,38 @@ class GameState():
                 else: 
                     self.blackKingLocation = (r, c)
 
-        self.getCastleMoves(r, c, moves, allyColor)
+        if not capturesOnly:
+            self.getCastleMoves(r, c, moves, allyColor)
+
+    def getKingMovesPseudoLegal(self, r, c, moves, capturesOnly=False):
+        """ King moves without testing if the end square is attacked. Castling is still fully checked. """
+
+        rowMoves = (-1, -1, -1, 0, 0, 1, 1, 1)
+        colMoves = (-1, 0, 1, -1, 1, -1, 0, 1)
+        allyColor = "w" if self.whiteToMove else "b"
+        for i in range(8):
+            endRow = r + rowMoves[i]
+            endCol = c + colMoves[i]
+            if 0 <= endRow < 8 and 0 <= endCol < 8:
+                endPiece = self.board[endRow][endCol]
+                if endPiece[0] != allyColor and (not capturesOnly or endPiece != '--'):
+                    moves.append(r * 8 + c | (endRow * 8 + endCol) << 6 | (MOVE_CAPTURE if endPiece != '--' else 0))
+        if not capturesOnly:
+            self.getCastleMoves(r, c, moves, allyColor)
 
     def getCastleMoves(self, r, c, moves, allyColor):
         """ Generate all possible castle moves for the king at r, c and add moves to list of moves """
 
-        if (self.whiteToMove and self.currentCastlingRight.wks) or \
-            (not(self.whiteToMove) and self.currentCastlingRight.bks):
+        kingSide, queenSide = (WKS, WQS) if self.whiteToMove else (BKS, BQS)
+        if self.castlingRights & kingSide:
             if self.board[r][c + 1] == '--' and self.board[r][c + 2] == '--':
                 if not(self.isCastleCheck([4,5,6])): # Are there checks on the 4th, 5th or 6th column
-                    moves.append(Move((r, c), (r, c + 2), self.board, isCastleMove=True))
+                    moves.append(r * 8 + c | (r * 8 + c + 2) << 6 | MOVE_CASTLE)
 
-        if (self.whiteToMove and self.currentCastlingRight.wqs) or \
-            (not(self.whiteToMove) and self.currentCastlingRight.bqs):
+        if self.castlingRights & queenSide:
             if self.board[r][c - 1] == '--' and self.board[r][c - 2] == '--' and self.board[r][c - 3] == '--':
                 if not(self.isCastleCheck([2,3,4])): # Are there checks on the 2nd, 3rd or 4th column
-                    moves.append(Move((r, c), (r, c - 2), self.board, isCastleMove=True))
+                    moves.append(r * 8 + c | (r * 8 + c - 2) << 6 | MOVE_CASTLE)
                 
     def isCastleCheck(self, positions):
         """ 
@@ -576,18 +1055,24 @@ class GameState():
 
         return totalCheck
 
-class CastleRights():
-    def __init__(self, wks, bks, wqs, bqs) -> None:
-        self.wks = wks
-        self.bks = bks
-        self.wqs = wqs
-        self.bqs = bqs                                                          
+# Move encoding in 16 bits, used as Move.moveID: start square (bits 0-5), end square (bits 6-11)
+# and flags (bits 12-15). Squares are row * 8 + col. Only queen promotions exist so no promotion piece is needed.
+MOVE_SQUARES_MASK = 0xFFF  # start and end squares: enough to tell the legal moves of a position apart
+MOVE_CAPTURE = 1 << 12
+MOVE_ENPASSANT = 1 << 13
+MOVE_CASTLE = 1 << 14
+MOVE_PROMOTION = 1 << 15
 
 class Move():
     """
     This class is used to store information relative to a move along with code to display it. 
+    Only used by the GUI and the notation: the move generators and the search work on the integer moveID
+    (see GameState.makeMoveID), and so do the search tables (transposition table, killers, PV).
     """
     
+    __slots__ = ("startRow", "startCol", "endRow", "endCol", "pieceMoved", "pieceCaptured",
+                 "isCapture", "isCastleMove", "isPawnPromotion", "isEnpassantMove", "moveID")
+
     # these will be used to translated from our (Row,Col) to chess notation
     ranksToRows = {"1": 7, "2": 6, "3": 5, "4": 4, "5": 3, "6": 2, "7": 1, "8": 0}
     rowsToRanks = {v:k for k, v in ranksToRows.items()}
@@ -595,30 +1080,62 @@ class Move():
     colsToFiles = {v:k for k, v in filesToCols.items()}
 
     def __init__(self, startSq, endSq, board, isEnpassantMove=False, isCastleMove=False) -> None:
-        self.startRow = startSq[0]
-        self.startCol = startSq[1]
-        self.endRow = endSq[0]
-        self.endCol = endSq[1]
-        self.pieceMoved = board[self.startRow][self.startCol]
-        self.pieceCaptured = board[self.endRow][self.endCol]
-        self.isCapture = self.pieceCaptured != '--'
+        self.startRow = startRow = startSq[0]
+        self.startCol = startCol = startSq[1]
+        self.endRow = endRow = endSq[0]
+        self.endCol = endCol = endSq[1]
+        self.pieceMoved = pieceMoved = board[startRow][startCol]
+        self.pieceCaptured = pieceCaptured = board[endRow][endCol]
         self.isCastleMove = isCastleMove
-        self.isPawnPromotion = (self.pieceMoved == 'wP' and self.endRow == 0) or \
-                                (self.pieceMoved == 'bP' and self.endRow == 7 ) 
-
         self.isEnpassantMove = isEnpassantMove
-        if self.isEnpassantMove:
-            self.pieceCaptured = "wP" if self.pieceMoved == "bP" else "bP"
-
-        self.moveID = self.startRow * 1000 + self.startCol * 100 + self.endRow * 10 + self.endCol
+        moveID = startRow * 8 + startCol | (endRow * 8 + endCol) << 6
+
+        self.isPawnPromotion = pieceMoved[1] == 'P' and (endRow == 0 or endRow == 7)
+        if self.isPawnPromotion:
+            moveID |= MOVE_PROMOTION
+        if isEnpassantMove:
+            pieceCaptured = self.pieceCaptured = "wP" if pieceMoved == "bP" else "bP"
+            moveID |= MOVE_ENPASSANT
+        elif isCastleMove:
+            moveID |= MOVE_CASTLE
+        self.isCapture = pieceCaptured != '--'
+        if self.isCapture:
+            moveID |= MOVE_CAPTURE
+        self.moveID = moveID
+
+    @classmethod
+    def fromMoveID(cls, moveID, pieceMoved, pieceCaptured):
+        """ The Move of a moveID. The pieces are not in the moveID, see GameState.toMove. """
+
+        move = cls.__new__(cls)
+        move.startRow, move.startCol = moveID >> 3 & 7, moveID & 7
+        move.endRow, move.endCol = moveID >> 9 & 7, moveID >> 6 & 7
+        move.pieceMoved = pieceMoved
+        move.pieceCaptured = pieceCaptured
+        move.isCapture = moveID & MOVE_CAPTURE != 0
+        move.isCastleMove = moveID & MOVE_CASTLE != 0
+        move.isPawnPromotion = moveID & MOVE_PROMOTION != 0
+        move.isEnpassantMove = moveID & MOVE_ENPASSANT != 0
+        move.moveID = moveID
+        return move
 
     def __eq__(self, other):
-        """ Overriding the equals method """
+        """ Overriding the equals method. Same start and end squares (moves typed in the GUI have no flags). """
         
         if isinstance(other, Move):
-            return self.moveID == other.moveID
+            return self.moveID & MOVE_SQUARES_MASK == other.moveID & MOVE_SQUARES_MASK
         return False
 
+    def __hash__(self):
+        """ Consistent with __eq__, so moves can be used in sets and as dictionary keys. """
+
+        return self.moveID & MOVE_SQUARES_MASK
+
+    def getCoordinateNotation(self):
+        """ Start and end squares, e.g. e2e4 or e7e8q. Used by perft divide. """
+
+        return coordinateNotation(self.moveID)
+
     def __str__(self):
         """ Overriding the str() function"""
         
@@ -641,3 +1158,10 @@ class Move():
                 moveString += 'x' 
             
             return moveString + endSquare
+
+def coordinateNotation(moveID):
+    """ Start and end squares of a moveID, e.g. e2e4 or e7e8q. """
+
+    notation = Move.colsToFiles[moveID & 7] + Move.rowsToRanks[moveID >> 3 & 7] + \
+               Move.colsToFiles[moveID >> 6 & 7] + Move.rowsToRanks[moveID >> 9 & 7]
+    return notation + 'q' if moveID & MOVE_PROMOTION else notation
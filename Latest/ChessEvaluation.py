@@ -0,0 +1,77 @@
+"""
+Static evaluation tables shared by ChessEngine and ChessAI.
+GameState keeps a running total of these scores in makeMove/undoMove (see GameState.updateBoardScore),
+so ChessAI.scoreBoard does not have to scan the board.
+"""
+
+# tables inspired from https://www.chessprogramming.org/Simplified_Evaluation_Function
+# Negative value are an interesting twist.
+
+kingScores =  [[+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00],
+                [+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00],
+                [+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00],
+                [+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00],
+                [+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00],
+                [+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00],
+                [+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00],
+                [+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00]]
+
+queenScores =  [[-0.20,-0.10,-0.10,-0.05,-0.05,-0.10,-0.10,-0.20],
+                [-0.10,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,-0.10],
+                [-0.10,+0.00,+0.05,+0.05,+0.05,+0.05,+0.00,-0.10],
+                [-0.50,+0.00,+0.05,+0.05,+0.05,+0.05,+0.00,-0.05],
+                [+0.00,+0.00,+0.05,+0.05,+0.05,+0.05,+0.00,-0.05],
+                [-0.10,+0.05,+0.05,+0.05,+0.05,+0.05,+0.00,-0.10],
+                [-0.10,+0.00,+0.05,+0.00,+0.00,+0.00,+0.00,-0.10],
+                [-0.20,-0.10,-0.10,-0.05,-0.05,-0.10,-0.10,-0.20]]
+
+rookScores =   [[+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00],
+                [+0.05,+0.10,+0.10,+0.10,+0.10,+0.10,+0.10,+0.05],
+                [-0.05,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,-0.05],
+                [-0.05,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,-0.05],
+                [-0.05,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,-0.05],
+                [-0.05,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,-0.05],
+                [-0.05,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,-0.05],
+                [-0.00,+0.00,+0.00,+0.05,+0.05,+0.00,+0.00,-0.00]]
+
+bishopScores = [[-0.20,-0.10,-0.10,-0.10,-0.10,-0.10,-0.10,-0.20],
+                [-0.10,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,-0.10],
+                [-0.10,+0.00,+0.05,+0.10,+0.10,+0.05,+0.00,-0.10],
+                [-0.10,+0.05,+0.05,+0.10,+0.10,+0.05,+0.05,-0.10],
+                [-0.10,+0.00,+0.10,+0.10,+0.10,+0.10,+0.00,-0.10],
+                [-0.10,+0.10,+0.10,+0.10,+0.10,+0.10,+0.10,-0.10],
+                [-0.10,+0.05,+0.00,+0.00,+0.00,+0.00,+0.05,-0.10],
+                [-0.20,-0.10,-0.10,-0.10,-0.10,-0.10,-0.10,-0.20]]
+
+knightScores = [[-0.50,-0.40,-0.30,-0.30,-0.30,-0.30,-0.40,-0.50],
+                [-0.40,-0.20,+0.00,+0.00,+0.00,+0.00,-0.20,-0.40],
+                [-0.30,+0.00,+0.10,+0.15,+0.15,+0.10,+0.00,-0.30],
+                [-0.30,+0.05,+0.15,+0.20,+0.20,+0.15,+0.05,-0.30],
+                [-0.30,+0.00,+0.15,+0.20,+0.20,+0.15,+0.00,-0.30],
+                [-0.30,+0.05,+0.10,+0.15,+0.15,+0.10,+0.05,-0.30],
+                [-0.40,-0.20,+0.00,+0.05,+0.05,+0.00,-0.20,-0.40],
+                [-0.50,-0.40,-0.30,-0.30,-0.30,-0.30,-0.40,-0.50]]
+
+PawnScores =   [[+9.00,+9.00,+9.00,+9.00,+9.00,+9.00,+9.00,+9.00],
+                [+0.80,+0.80,+0.80,+0.80,+0.80,+0.80,+0.80,+0.80],
+                [+0.35,+0.50,+0.50,+0.50,+0.50,+0.50,+0.50,+0.35],
+                [+0.15,+0.25,+0.30,+0.45,+0.45,+0.30,+0.25,+0.15],
+                [+0.10,+0.20,+0.20,+0.40,+0.40,+0.20,+0.20,+0.10],
+                [+0.15,+0.00,-0.10,+0.10,+0.10,-0.10,+0.00,+0.15],
+                [+0.05,+0.10,+0.00,-0.20,-0.20,+0.10,+0.10,+0.05],
+                [+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00,+0.00]]
+
+
+piecePositionScores = {"wK": kingScores, "bK": kingScores[::-1], 
+                       "wQ": queenScores, "bQ": queenScores[::-1], 
+                       "wR": rookScores,"bR": rookScores[::-1], 
+                       "wB": bishopScores, "bB": bishopScores[::-1],
+                       "wN": knightScores, "bN": knightScores[::-1],
+                       "wP": PawnScores, "bP": PawnScores[::-1]}
+
+pieceScore = {"K": 0, "Q": 9, "R": 5, "B": 3, "N": 3, "P": 1}
+
+# Same scores in centipawns (integers, so the running totals never drift), signed: positive is good for white.
+materialScores = {piece: 100 * pieceScore[piece[1]] * (1 if piece[0] == 'w' else -1) for piece in piecePositionScores}
+positionScores = {piece: [round(100 * table[sq // 8][sq % 8]) * (1 if piece[0] == 'w' else -1) for sq in range(64)]
+                  for piece, table in piecePositionScores.items()}
@@ -9,9 +9,10 @@ This is our main driver file. It is responsible for handling user input and disp
 import os
 os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = "hide"
 import pygame as p
-from multiprocessing import Process, Queue
 import ChessEngine
+import ChessBitboard
 import ChessAI
+import ChessWorker
 
 DIMENSION = 8                               
 BOARD_WIDTH = BOARD_HEIGHT = 512            
@@ -21,6 +22,9 @@ SQ_SIZE = BOARD_HEIGHT // DIMENSION
 MAX_FPS = 15                    # For animations later on
 IMAGES = {}
 COLORS = ["white", "gray"]      # Colors for the squares
+USE_BITBOARDS = True            # True: bitboard move generator (ChessBitboard). False: original 8x8 list generator
+PONDER = True                   # The AI thinks on the human's time about the reply it expects (see ChessWorker)
+EXPORT_SEARCH_TREE = False      # Save each AI search tree to an Excel file. Requires the openpyxl library
 
 def loadImages():
     """ Initialize a global dictionary of images. This will be called once in main. """
@@ -29,6 +33,11 @@ def loadImages():
     for pieces in pieces:
         IMAGES[pieces] = p.transform.scale(p.image.load("images/" + pieces + ".png"), (SQ_SIZE,SQ_SIZE))
 
+def newGameState():
+    """ Returns a new game in the starting position, using the selected board representation. """
+
+    return ChessBitboard.BitboardGameState() if USE_BITBOARDS else ChessEngine.GameState()
+
 def main():
     """ The main driver for our code. This will handle user input and updating the graphics """
 
@@ -48,9 +57,9 @@ def main():
     playerOne = False       # True if Human, False if AI
     playerTwo = False      # True if Human, False if AI
     AIThinking = False
-    moveFinderProcess = None
+    engineWorker = ChessWorker.EngineWorker(EXPORT_SEARCH_TREE) # searches the AI moves in another process, kept for the whole session
 
-    gs = ChessEngine.GameState()
+    gs = newGameState()
     validMoves = gs.getValidMoves()
 
     running = True
@@ -82,6 +91,7 @@ def main():
                         for i in range(len(validMoves)):
                             if move == validMoves[i]:
                                 gs.makeMove(validMoves[i])
+                                AIThinking = engineWorker.opponentMoved(validMoves[i]) # ponder hit: keep thinking
                                 moveMade = True
                                 animate = True
                                 sqSelected = ()         
@@ -99,12 +109,11 @@ def main():
                     moveUndone = True
                     sqSelected = ()
                     playerClicks = []  
-                    if AIThinking:
-                        moveFinderProcess.terminate()
-                        AIThinking = False
+                    engineWorker.stop() # also stops pondering
+                    AIThinking = False
 
                 if e.key == p.K_r: # reset the board when 'r' is pressed
-                    gs = ChessEngine.GameState()
+                    gs = newGameState()
                     validMoves = gs.getValidMoves()
                     sqSelected = ()
                     playerClicks = []
@@ -112,20 +121,18 @@ def main():
                     animate = False
                     gameOver = False
                     moveUndone = True
-                    if AIThinking:
-                        moveFinderProcess.terminate()
-                        AIThinking = False
+                    engineWorker.newGame() # also stops the current search
+                    AIThinking = False
 
         # AI Move finder logic
         if not humanTurn and not gameOver and not moveUndone:
             if not AIThinking:
                 AIThinking = True 
-                returnQueue = Queue() 
-                moveFinderProcess = Process(target=ChessAI.findBestMove, args=(gs, validMoves, returnQueue))
-                moveFinderProcess.start()
+                engineWorker.go(gs)
 
-            if not moveFinderProcess.is_alive():
-                AIMove = returnQueue.get()
+            done, AIMoveID = engineWorker.poll()
+            if done:
+                AIMove = next((move for move in validMoves if move.moveID == AIMoveID), None)
                 if AIMove is None:  
                     AIMove = ChessAI.findRandomMove(validMoves)
                 gs.makeMove(AIMove)
@@ -133,6 +140,11 @@ def main():
                 animate = True
                 AIThinking = False
 
+        # Pondering: while the human thinks, search the reply to the move the AI expects from them.
+        elif PONDER and humanTurn and not gameOver and not moveUndone and not engineWorker.thinking \
+                and not engineWorker.pondering:
+            engineWorker.ponder(gs, validMoves)
+
         if moveMade:
             if animate: 
                 animateMove(gs.moveLog[-1], screen, gs.board, clock)
@@ -148,10 +160,15 @@ def main():
             gameOver = True
             drawEndGameText(screen, 'Stalemate' if gs.stalemate else \
                             ('Black' if gs.whiteToMove else 'White') + ' wins by checkmate')
+        elif gs.isThreefoldRepetition():
+            gameOver = True
+            drawEndGameText(screen, 'Draw by threefold repetition')
   
         clock.tick(MAX_FPS)
         p.display.flip()
 
+    engineWorker.close()
+
 def drawGameState(screen, gs, validMoves, sqSelected, moveLogFont):
     """ Responsible for all graphics with a current game state """
 
@@ -0,0 +1,338 @@
+"""
+Headless self-play: plays two engine configurations against each other to measure whether a search change
+plays better. No pygame. Games run in parallel in worker processes, each opening is played with both colors.
+
+    python ChessMatch.py --player base --player noqs:useQuiescenceSearch=False --games 200 --nodes 20000
+    python ChessMatch.py --player a --player b:searchTimeLimit=0.5 --time 0.25 --concurrency 4 --pgn match.pgn
+    python ChessMatch.py ... --sprt 0 10        stop as soon as the SPRT accepts H0 (elo0) or H1 (elo1)
+
+A player is NAME[:setting=value,...] where the settings are ChessAI globals (useTranspositionTable=False,
+multiPV=1, ...), applied on top of the limits of the match. Each player keeps its own transposition table, of its
+transpositionTableMB, and move ordering during a game. Statistics are from the first player's side.
+"""
+
+import argparse
+import math
+import multiprocessing
+import queue
+import random
+import time
+import ChessEngine
+import ChessBitboard
+import ChessTranspositionTable as ChessTT
+import ChessMoveOrdering
+import ChessAI
+
+# Short, balanced opening lines in coordinate notation, used when no --openings file is given.
+OPENINGS = [
+    "e2e4 e7e5 g1f3 b8c6 f1b5",         # Ruy Lopez
+    "e2e4 e7e5 g1f3 b8c6 f1c4",         # Italian
+    "e2e4 c7c5 g1f3 d7d6 d2d4",         # Sicilian
+    "e2e4 e7e6 d2d4 d7d5 b1c3",         # French
+    "e2e4 c7c6 d2d4 d7d5 b1c3",         # Caro-Kann
+    "d2d4 d7d5 c2c4 e7e6 b1c3",         # Queen's Gambit Declined
+    "d2d4 d7d5 c2c4 c7c6 g1f3",         # Slav
+    "d2d4 g8f6 c2c4 e7e6 b1c3 f8b4",    # Nimzo-Indian
+    "d2d4 g8f6 c2c4 g7g6 b1c3 f8g7",    # King's Indian
+    "c2c4 e7e5 b1c3 g8f6 g1f3",         # English
+    "g1f3 d7d5 g2g3 g8f6 f1g2",         # Reti
+    "e2e4 d7d5 e4d5 d8d5 b1c3",         # Scandinavian
+]
+MAX_MOVES = 200         # Games still running after this many moves are adjudicated a draw
+
+def parsePlayer(text):
+    """ "NAME[:setting=value,...]" -> (name, {setting: value}). Values are Python literals. """
+
+    name, _, settingsText = text.partition(":")
+    return name, dict(ChessAI.parseSetting(setting) for setting in filter(None, settingsText.split(",")))
+
+def loadOpenings(fileName):
+    """ Openings as (fen, [coordinate moves]). The file has one FEN or EPD per line. """
+
+    if fileName is None:
+        return [(ChessEngine.START_FEN, line.split()) for line in OPENINGS]
+    with open(fileName) as file:
+        return [(" ".join(line.split()[:6]), []) for line in file if line.strip() and not line.startswith("#")]
+
+def initMatchWorker():
+    """ Runs once in each game process. """
+
+    ChessAI.showSearchSummary = False
+    ChessAI.parallelWorkers = 0 # the games are the parallelism, a game process can't have its own pool
+
+def playGame(task):
+    """
+    Runs in a game process: plays one game and returns it as a dict (players, result, termination,
+    SAN moves, nodes and time per player).
+    """
+
+    gameNumber, fen, openingMoves, players, white, limits, gameStateClass, seed = task
+    random.seed(seed)
+    names = set(limits).union(*(settings for name, settings in players))
+    defaults = {name: getattr(ChessAI, name) for name in names}
+    sides = [(ChessTT.TranspositionTable(settings.get("transpositionTableMB", ChessAI.transpositionTableMB)),
+              ChessMoveOrdering.MoveOrdering()) for name, settings in players]
+    nodes = [0, 0]
+    thinkingTime = [0.0, 0.0]
+
+    gs = gameStateClass.fromFEN(fen)
+    sanMoves = []
+    for notation in openingMoves:
+        move = next(move for move in gs.getValidMoves() if move.getCoordinateNotation() == notation)
+        sanMoves.append(sanNotation(gs, move))
+        gs.makeMove(move)
+
+    while True:
+        validMoves = gs.getValidMoves()
+        if gs.checkmate:
+            result, termination = ("0-1" if gs.whiteToMove else "1-0"), "checkmate"
+            break
+        if gs.stalemate:
+            result, termination = "1/2-1/2", "stalemate"
+            break
+        if gs.halfmoveClock >= 100:
+            result, termination = "1/2-1/2", "fifty move rule"
+            break
+        if gs.isThreefoldRepetition():
+            result, termination = "1/2-1/2", "threefold repetition"
+            break
+        if isInsufficientMaterial(gs):
+            result, termination = "1/2-1/2", "insufficient material"
+            break
+        if len(gs.moveLog) >= 2 * MAX_MOVES:
+            result, termination = "1/2-1/2", "adjudication"
+            break
+
+        # Set up the ChessAI globals, transposition table and move ordering of the player to move.
+        player = white if gs.whiteToMove else 1 - white
+        settings = {**limits, **players[player][1]}
+        for name in names:
+            setattr(ChessAI, name, settings.get(name, defaults[name]))
+        ChessAI.transpositionTable, ChessAI.moveOrdering = sides[player]
+
+        startTime = time.time()
+        returnQueue = queue.Queue()
+        ChessAI.findBestMove(gs, validMoves, returnQueue)
+        move = returnQueue.get() or validMoves[0]
+        thinkingTime[player] += time.time() - startTime
+        nodes[player] += ChessAI.nodesSearched
+
+        sanMoves.append(sanNotation(gs, move))
+        gs.makeMove(move)
+
+    for name in names: # the next game of this process starts from the same defaults
+        setattr(ChessAI, name, defaults[name])
+    return {"round": gameNumber, "fen": fen, "white": players[white][0], "black": players[1 - white][0],
+            "firstIsWhite": white == 0, "result": result, "termination": termination, "moves": sanMoves,
+            "nodes": nodes, "time": thinkingTime}
+
+def sanNotation(gs, move):
+    """ Standard algebraic notation of move in gs (before it is made): disambiguation, promotion and check. """
+
+    notation = str(move)
+    if move.pieceMoved[1] == "P" and move.isCapture and move.isPawnPromotion:
+        notation += "=Q"
+    elif move.pieceMoved[1] not in "PK":
+        others = [other for other in gs.getValidMoves() if other.pieceMoved == move.pieceMoved and
+                  other.endRow == move.endRow and other.endCol == move.endCol and other != move]
+        if others:
+            startFile = move.colsToFiles[move.startCol]
+            startRank = move.rowsToRanks[move.startRow]
+            if all(other.startCol != move.startCol for other in others):
+                notation = notation[0] + startFile + notation[1:]
+            elif all(other.startRow != move.startRow for other in others):
+                notation = notation[0] + startRank + notation[1:]
+            else:
+                notation = notation[0] + startFile + startRank + notation[1:]
+
+    gs.makeMove(move)
+    if gs.isInCheck():
+        notation += "#" if len(gs.getValidMoves()) == 0 else "+"
+    gs.undoMove()
+    return notation
+
+def isInsufficientMaterial(gs):
+    """ Only the kings are left, or the kings and a single bishop or knight. """
+
+    pieces = [square[1] for row in gs.board for square in row if square != "--" and square[1] != "K"]
+    return len(pieces) == 0 or (len(pieces) == 1 and pieces[0] in "BN")
+
+def toPGN(game, event):
+    """ One game in PGN. See https://www.chessprogramming.org/Portable_Game_Notation """
+
+    headers = [("Event", event), ("Site", "ChessMatch"), ("Date", time.strftime("%Y.%m.%d")),
+               ("Round", str(game["round"])), ("White", game["white"]), ("Black", game["black"]),
+               ("Result", game["result"]), ("Termination", game["termination"])]
+    if game["fen"] != ChessEngine.START_FEN:
+        headers += [("SetUp", "1"), ("FEN", game["fen"])]
+    fields = game["fen"].split()
+    whiteStarts = len(fields) < 2 or fields[1] == "w"
+    moveNumber = int(fields[5]) if len(fields) > 5 else 1
+
+    tokens = []
+    for i, san in enumerate(game["moves"]):
+        whiteMove = (i % 2 == 0) == whiteStarts
+        if whiteMove:
+            tokens.append(f"{moveNumber}.")
+        elif i == 0:
+            tokens.append(f"{moveNumber}...")
+        tokens.append(san)
+        if not whiteMove:
+            moveNumber += 1
+    tokens.append(game["result"])
+
+    lines, line = [], ""
+    for token in tokens: # PGN lines are at most 80 characters
+        if len(line) + len(token) + 1 > 80:
+            lines.append(line)
+            line = token
+        else:
+            line = f"{line} {token}" if line else token
+    lines.append(line)
+    return "\n".join(f'[{key} "{value}"]' for key, value in headers) + "\n\n" + "\n".join(lines) + "\n\n"
+
+class MatchStatistics():
+    """ Win/draw/loss count of the first player, with the Elo difference, its error margin and the SPRT. """
+
+    def __init__(self, sprt=None, alpha=0.05, beta=0.05) -> None:
+        self.wins = self.draws = self.losses = 0
+        self.sprt = sprt # (elo0, elo1) or None
+        self.lowerBound = math.log(beta / (1 - alpha))
+        self.upperBound = math.log((1 - beta) / alpha)
+
+    def addGame(self, game):
+        """ Counts a finished game (dict from playGame). """
+
+        if game["result"] == "1/2-1/2":
+            self.draws += 1
+        elif (game["result"] == "1-0") == game["firstIsWhite"]:
+            self.wins += 1
+        else:
+            self.losses += 1
+
+    def games(self):
+        return self.wins + self.draws + self.losses
+
+    def score(self):
+        """ Average points per game of the first player. """
+
+        return (self.wins + self.draws / 2) / self.games()
+
+    def variance(self):
+        """ Variance of the points of one game. """
+
+        score = self.score()
+        return (self.wins * (1 - score) ** 2 + self.draws * (0.5 - score) ** 2 + self.losses * score ** 2) / \
+               self.games()
+
+    def elo(self):
+        """ (Elo difference, 95% error margin) of the first player. See https://www.chessprogramming.org/Match_Statistics """
+
+        margin = 1.96 * math.sqrt(self.variance() / self.games())
+        difference = scoreToElo(self.score())
+        return difference, (scoreToElo(self.score() + margin) - scoreToElo(self.score() - margin)) / 2
+
+    def llr(self):
+        """
+        Log-likelihood ratio of H1 (first player elo1 stronger) against H0 (elo0), normal approximation
+        of the game results. The test accepts H1 above upperBound, H0 below lowerBound.
+        """
+
+        variance = self.variance()
+        if variance == 0:
+            return 0.0
+        elo0, elo1 = self.sprt
+        score0, score1 = eloToScore(elo0), eloToScore(elo1)
+        return self.games() * (score1 - score0) * (2 * self.score() - score0 - score1) / (2 * variance)
+
+    def sprtDecision(self):
+        """ "H0", "H1" or None while undecided. """
+
+        if self.sprt is None or self.games() == 0:
+            return None
+        llr = self.llr()
+        return "H1" if llr >= self.upperBound else ("H0" if llr <= self.lowerBound else None)
+
+    def summary(self):
+        text = f"W/D/L: {self.wins}/{self.draws}/{self.losses} ({self.games()} games), score {self.score():.3f}"
+        difference, margin = self.elo()
+        text += f", Elo {difference:+.1f} +/- {margin:.1f}"
+        if self.sprt is not None:
+            text += f", SPRT [{self.sprt[0]}, {self.sprt[1]}] LLR {self.llr():.2f} " + \
+                    f"({self.lowerBound:.2f}, {self.upperBound:.2f})"
+        return text
+
+def scoreToElo(score):
+    """ Elo difference giving this expected score. Capped for a perfect or zero score. """
+
+    score = min(max(score, 0.001), 0.999)
+    return -400 * math.log10(1 / score - 1)
+
+def eloToScore(elo):
+    """ Expected score for an Elo difference. """
+
+    return 1 / (1 + 10 ** (-elo / 400))
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless self-play match between two engine configurations.")
+    parser.add_argument("--player", action="append", required=True, help="NAME[:setting=value,...], given twice")
+    parser.add_argument("--games", type=int, default=100, help="number of games (default: 100)")
+    parser.add_argument("--concurrency", type=int, default=multiprocessing.cpu_count(), help="games in parallel")
+    parser.add_argument("--time", type=float, default=None, help="seconds per move")
+    parser.add_argument("--nodes", type=int, default=None, help="nodes per move (reproducible, unlike --time)")
+    parser.add_argument("--depth", type=int, default=None, help="deepest iteration per move")
+    parser.add_argument("--openings", default=None, help="file with one FEN or EPD per line (default: built-in)")
+    parser.add_argument("--pgn", default=None, help="file the games are appended to")
+    parser.add_argument("--sprt", type=float, nargs=2, metavar=("ELO0", "ELO1"), help="stop when the SPRT decides")
+    parser.add_argument("--seed", type=int, default=0, help="random seed of the games")
+    parser.add_argument("--engine", choices=("bitboard", "list"), default="bitboard", help="move generator to use")
+    args = parser.parse_args()
+    if len(args.player) != 2:
+        parser.error("give exactly two --player")
+
+    players = [parsePlayer(player) for player in args.player]
+    limits = {"useIterativeDeepening": True}
+    if args.time is not None:
+        limits["searchTimeLimit"] = args.time
+    if args.nodes is not None:
+        limits["searchNodeLimit"] = args.nodes
+        limits.setdefault("searchTimeLimit", 0)
+    if args.depth is not None:
+        limits["maxIterativeDepth"] = args.depth
+        limits.setdefault("searchTimeLimit", 0)
+    gameStateClass = ChessEngine.GameState if args.engine == "list" else ChessBitboard.BitboardGameState
+    openings = loadOpenings(args.openings)
+
+    # Game 2k and 2k+1 play the same opening with the colors swapped.
+    tasks = [(game + 1, *openings[game // 2 % len(openings)], players, game % 2, limits, gameStateClass,
+              args.seed * 100003 + game) for game in range(args.games)]
+    statistics = MatchStatistics(args.sprt)
+    event = f"{players[0][0]} vs {players[1][0]}"
+    nodes, thinkingTime = [0, 0], [0.0, 0.0]
+    startTime = time.time()
+
+    with multiprocessing.Pool(args.concurrency, initializer=initMatchWorker) as pool:
+        for game in pool.imap_unordered(playGame, tasks):
+            statistics.addGame(game)
+            for player in range(2):
+                nodes[player] += game["nodes"][player]
+                thinkingTime[player] += game["time"][player]
+            if args.pgn is not None:
+                with open(args.pgn, "a") as pgnFile:
+                    pgnFile.write(toPGN(game, event))
+            print(f'Game {game["round"]:>4}: {game["white"]} - {game["black"]} {game["result"]:<7} ' +
+                  f'({game["termination"]}, {len(game["moves"])} plies)  {statistics.summary()}', flush=True)
+            decision = statistics.sprtDecision()
+            if decision is not None:
+                print(f"SPRT accepts {decision}")
+                pool.terminate()
+                break
+
+    print(f"{event}: {statistics.summary()}")
+    for player in range(2):
+        print(f"    {players[player][0]}: {nodes[player]} nodes in {thinkingTime[player]:.1f}s " +
+              f"({nodes[player] / max(thinkingTime[player], 1e-6):,.0f} nodes/s)")
+    print(f"Total time: {time.time() - startTime:.1f}s")
+
+if __name__ == "__main__":
+    main()
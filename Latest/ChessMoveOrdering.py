@@ -0,0 +1,99 @@
+"""
+Move ordering used by ChessAI.NegaMaxAlphaBeta. See https://www.chessprogramming.org/Move_Ordering
+Alpha-beta prunes the most when the best move is searched first, so every move gets a score and the
+list is sorted before the search loop:
+    1) the hash move (best move of the previous iteration or of the transposition table)
+    2) captures and promotions, by MVV-LVA (Most Valuable Victim - Least Valuable Attacker)
+    3) the 2 killer moves of this ply (quiet moves that caused a cutoff in a sibling node)
+    4) other quiet moves, by history score (how often the move caused a cutoff anywhere in the tree)
+Moves are moveIDs (see ChessEngine.Move): the pieces are looked up in the GameState they are played in.
+"""
+
+from ChessEngine import MOVE_CAPTURE, MOVE_PROMOTION
+
+HASH_MOVE_SCORE = 1000000
+CAPTURE_SCORE = 100000
+KILLER_SCORES = (90000, 80000)  # slot 0 (most recent) and slot 1
+HISTORY_MAX = 50000             # history scores are halved when one gets this big, so they stay below killers
+MAX_PLY = 128
+
+# Used for MVV-LVA only. The king is the least attractive attacker since it can rarely recapture.
+mvvLvaValues = {"P": 1, "N": 3, "B": 3, "R": 5, "Q": 9, "K": 10}
+
+class MoveOrdering():
+    """ Scores and sorts moves. Keeps the killer and history tables and the cutoff statistics. """
+
+    def __init__(self) -> None:
+        self.killers = [[None, None] for ply in range(MAX_PLY)]
+        self.history = {color + piece: [0] * 64 for color in "wb" for piece in "PNBRQK"}
+        self.resetStatistics()
+
+    def resetStatistics(self):
+        """ Cutoff statistics, reported by ChessAI after each search. """
+
+        self.cutoffNodes = 0        # nodes where a move caused a beta cutoff
+        self.firstMoveCutoffs = 0   # ... and that move was the first one searched
+        self.cutoffIndexTotal = 0   # sum of the index of the cutoff move, to get the average
+
+    def newSearch(self):
+        """ Called before each search. Killers are only valid for the tree they were found in, history is aged. """
+
+        self.killers = [[None, None] for ply in range(MAX_PLY)]
+        for scores in self.history.values():
+            for sq in range(64):
+                scores[sq] //= 2
+        self.resetStatistics()
+
+    def scoreMove(self, gs, move, ply, hashMoveID):
+        """ Higher is searched first. """
+
+        if move == hashMoveID:
+            return HASH_MOVE_SCORE
+        if move & (MOVE_CAPTURE | MOVE_PROMOTION):
+            score = CAPTURE_SCORE - mvvLvaValues[gs.pieceAt(move & 63)[1]]
+            if move & MOVE_CAPTURE:
+                score += 10 * mvvLvaValues[gs.capturedPiece(move)[1]]
+            if move & MOVE_PROMOTION:
+                score += 10 * mvvLvaValues['Q']
+            return score
+        killers = self.killers[ply]
+        if move == killers[0]:
+            return KILLER_SCORES[0]
+        if move == killers[1]:
+            return KILLER_SCORES[1]
+        return self.history[gs.pieceAt(move & 63)][move >> 6 & 63]
+
+    def orderMoves(self, gs, moves, ply, hashMoveID=None):
+        """ Sorts the list of moves of gs in place, best first. The sort is stable so equal moves keep their order. """
+
+        moves.sort(key=lambda move: self.scoreMove(gs, move, ply, hashMoveID), reverse=True)
+
+    def recordCutoff(self, gs, move, moveIndex, ply, depth):
+        """ Called on a beta cutoff by move, gs is back before it. Quiet moves become killers and gain history. """
+
+        self.cutoffNodes += 1
+        self.cutoffIndexTotal += moveIndex
+        if moveIndex == 0:
+            self.firstMoveCutoffs += 1
+
+        if not move & (MOVE_CAPTURE | MOVE_PROMOTION):
+            killers = self.killers[ply]
+            if killers[0] != move:
+                killers[1] = killers[0]
+                killers[0] = move
+
+            scores = self.history[gs.pieceAt(move & 63)]
+            endSq = move >> 6 & 63
+            scores[endSq] += depth * depth # deeper cutoffs are worth more
+            if scores[endSq] > HISTORY_MAX:
+                for table in self.history.values():
+                    for sq in range(64):
+                        table[sq] //= 2
+
+    def statistics(self):
+        """ Short text with the cutoff statistics for the search summary. """
+
+        if self.cutoffNodes == 0:
+            return "no cutoffs"
+        return f'{self.cutoffNodes} cutoffs, {100 * self.firstMoveCutoffs / self.cutoffNodes:.1f}% on 1st move, ' + \
+               f'avg move# {self.cutoffIndexTotal / self.cutoffNodes:.2f}'
@@ -0,0 +1,116 @@
+"""
+Perft: counts the leaf nodes of the move generation tree to a given depth. See https://www.chessprogramming.org/Perft
+Used to check the move generators (makeMoveID/getValidMoveIDs/undoMoveID) against known counts and to measure
+their speed.
+
+    python ChessPerft.py --depth 4                      start position to depth 4
+    python ChessPerft.py --fen "<fen>" --depth 3 --divide
+    python ChessPerft.py --suite                        all reference positions, exits with 1 on a mismatch
+    python ChessPerft.py --suite --engine list          same with the original 8x8 list generator
+"""
+
+import argparse
+import sys
+import time
+import ChessEngine
+import ChessBitboard
+
+# (name, fen, {depth: expected nodes}). Counts from https://www.chessprogramming.org/Perft_Results
+# The engine only promotes to a queen, so depths where an underpromotion is possible are left out.
+REFERENCE_POSITIONS = [
+    ("start", ChessEngine.START_FEN,
+     {1: 20, 2: 400, 3: 8902, 4: 197281}),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+     {1: 48, 2: 2039, 3: 97862}),
+    ("position 3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+     {1: 14, 2: 191, 3: 2812, 4: 43238}),
+    ("position 4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+     {1: 6}),
+    ("position 6", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+     {1: 46, 2: 2079, 3: 89890}),
+]
+
+def newGameState(engine, fen):
+    """ Game state for the chosen move generator: 'bitboard' or 'list'. """
+
+    if engine == 'list':
+        return ChessEngine.GameState.fromFEN(fen)
+    return ChessBitboard.BitboardGameState.fromFEN(fen)
+
+def perft(gs, depth):
+    """ Number of leaf nodes at depth. The last ply is counted without making the moves (bulk counting). """
+
+    moves = gs.getValidMoveIDs()
+    if depth <= 1:
+        return len(moves) if depth == 1 else 1
+    nodes = 0
+    for move in moves:
+        gs.makeMoveID(move)
+        nodes += perft(gs, depth - 1)
+        gs.undoMoveID()
+    return nodes
+
+def divide(gs, depth):
+    """ Perft split per root move, as [(move, nodes)]. Compare with another engine to find the faulty move. """
+
+    results = []
+    for move in gs.getValidMoves():
+        gs.makeMove(move)
+        results.append((move, perft(gs, depth - 1)))
+        gs.undoMove()
+    return results
+
+def runPerft(gs, depth, showDivide=False):
+    """ Runs perft (or divide) on gs, prints the counts and speed and returns the node count. """
+
+    startTime = time.time()
+    if showDivide:
+        results = divide(gs, depth)
+        for move, nodes in sorted(results, key=lambda result: result[0].getCoordinateNotation()):
+            print(f'{move.getCoordinateNotation()}: {nodes}')
+        nodes = sum(nodes for move, nodes in results)
+    else:
+        nodes = perft(gs, depth)
+    elapsed = time.time() - startTime
+    print(f'Depth: {depth} , Nodes: {nodes} , Time: {elapsed:.2f}s , Nodes/s: {nodes / max(elapsed, 1e-6):,.0f}')
+    return nodes
+
+def runSuite(engine, maxDepth):
+    """ Runs every reference position up to maxDepth. Returns the number of mismatches. """
+
+    failures = 0
+    totalNodes = 0
+    startTime = time.time()
+    for name, fen, expected in REFERENCE_POSITIONS:
+        for depth, expectedNodes in expected.items():
+            if depth > maxDepth:
+                continue
+            gs = newGameState(engine, fen)
+            positionStart = time.time()
+            nodes = perft(gs, depth)
+            elapsed = time.time() - positionStart
+            totalNodes += nodes
+            status = "ok" if nodes == expectedNodes else f"FAIL (expected {expectedNodes})"
+            if nodes != expectedNodes:
+                failures += 1
+            print(f'{name:<12} depth {depth}: {nodes:>9} nodes, {elapsed:6.2f}s  {status}')
+    elapsed = time.time() - startTime
+    print(f'Total: {totalNodes} nodes in {elapsed:.2f}s ({totalNodes / max(elapsed, 1e-6):,.0f} nodes/s), ' +
+          f'{failures} failure(s)')
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Perft move generation test and benchmark.")
+    parser.add_argument("--fen", default=ChessEngine.START_FEN, help="position to search (default: start position)")
+    parser.add_argument("--depth", type=int, default=4, help="search depth (suite: maximum depth)")
+    parser.add_argument("--divide", action="store_true", help="show the node count of each root move")
+    parser.add_argument("--suite", action="store_true", help="run the reference positions and check the counts")
+    parser.add_argument("--engine", choices=("bitboard", "list"), default="bitboard", help="move generator to use")
+    args = parser.parse_args()
+
+    if args.suite:
+        sys.exit(1 if runSuite(args.engine, args.depth) else 0)
+    runPerft(newGameState(args.engine, args.fen), args.depth, args.divide)
+
+if __name__ == "__main__":
+    main()
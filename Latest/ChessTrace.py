@@ -0,0 +1,28 @@
+"""
+Observers of the search tree, installed with ChessAI.setSearchTracer.
+The default SearchTracer does nothing and costs nothing: ChessAI only calls the tracer when one was installed.
+Tracers that need extra libraries are imported only when they are requested.
+"""
+
+class SearchTracer():
+    """ Base tracer: ignores everything. Subclass it and override the methods to record the search. """
+
+    maxDepth = None # deepest iteration the tracer can record, None if not limited
+
+    def newSearch(self, gs):
+        """ Called by findBestMove before searching gs. """
+
+    def newBestRootMove(self, move):
+        """ A root move became the best one so far. """
+
+    def node(self, depth, moveSeq, score):
+        """ A child was searched: moveSeq leads to it from the root, score is from white's side. """
+
+    def searchDone(self, gs):
+        """ Called by findBestMove when the search of gs is over. """
+
+def excelTracer(maxDepth):
+    """ Exports each search tree to an Excel file. Requires the openpyxl library, see ChessTree2Excel. """
+
+    import ChessTree2Excel
+    return ChessTree2Excel.searchTree(maxDepth)
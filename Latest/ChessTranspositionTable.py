@@ -0,0 +1,137 @@
+"""
+Transposition table used by ChessAI to remember positions already searched.
+See https://www.chessprogramming.org/Transposition_Table
+
+Positions are found by their GameState.zobristKey. Each bucket holds 2 entries:
+    - slot 0 is depth-preferred: only replaced by a search at least as deep (or the same position).
+    - slot 1 is always-replace: takes everything that did not go into slot 0.
+An entry is a tuple (key, depth, score, flag, bestMoveID).
+"""
+
+EXACT = 0       # score is the exact value of the position
+LOWERBOUND = 1  # search failed high (beta cutoff): real score >= score
+UPPERBOUND = 2  # search failed low (no move raised alpha): real score <= score
+
+ENTRY_BYTES = 160 # Rough memory used by one entry (tuple + its ints) in Python. Used to turn MB into entries.
+
+class TranspositionTable():
+    """ Fixed size hash table of search results. Size is given in MB and never grows. """
+
+    def __init__(self, sizeMB) -> None:
+        self.numBuckets = max(1, sizeMB * 1024 * 1024 // (2 * ENTRY_BYTES))
+        self.entries = [None] * (2 * self.numBuckets)
+        self.probes = 0
+        self.hits = 0
+
+    def clear(self):
+        """ Empty the table and reset the counters. """
+
+        self.entries = [None] * (2 * self.numBuckets)
+        self.probes = 0
+        self.hits = 0
+
+    def probe(self, key):
+        """ Returns the entry stored for this zobrist key, or None. """
+
+        self.probes += 1
+        index = 2 * (key % self.numBuckets)
+        for entry in (self.entries[index], self.entries[index + 1]):
+            if entry is not None and entry[0] == key:
+                self.hits += 1
+                return entry
+        return None
+
+    def store(self, key, depth, score, flag, bestMoveID):
+        """ Save a search result using the depth-preferred + always-replace scheme. """
+
+        index = 2 * (key % self.numBuckets)
+        deepEntry = self.entries[index]
+        if deepEntry is None or deepEntry[0] == key or depth >= deepEntry[1]:
+            self.entries[index] = (key, depth, score, flag, bestMoveID)
+        else:
+            self.entries[index + 1] = (key, depth, score, flag, bestMoveID)
+
+    def usage(self):
+        """ Fraction of the slots in use. Used in the search summary. """
+
+        return (len(self.entries) - self.entries.count(None)) / len(self.entries)
+
+SHARED_ENTRY_BYTES = 16 # 2 unsigned 64-bit words: key ^ data, data
+SCORE_SCALE = 100       # scores are kept as integers in hundredths of a pawn
+SCORE_OFFSET = 1 << 31  # makes the scaled score positive so it fits in 32 unsigned bits
+USAGE_SAMPLE = 4096     # entries looked at by usage(): reading the whole shared table takes too long
+
+class SharedTranspositionTable():
+    """ 
+    Same interface and replacement scheme as TranspositionTable, but stored in multiprocessing.shared_memory
+    so several processes search with one table (Lazy SMP, see ChessAI.lazySMPSearch).
+    Entries are written without locks. Each one is 2 words: data = bestMoveID | depth << 16 | flag << 24 |
+    score << 32, and key ^ data. A reader only accepts an entry if the 2 words XOR back to its key, so an entry
+    half written by another process is seen as a miss instead of a wrong result.
+    """
+
+    def __init__(self, sizeMB, name=None) -> None:
+        """ Creates a new table, or attaches to the one created by another process when name is given. """
+
+        from multiprocessing import shared_memory # only needed when the search runs in several processes
+        self.numBuckets = max(1, sizeMB * 1024 * 1024 // (2 * SHARED_ENTRY_BYTES))
+        size = 2 * self.numBuckets * SHARED_ENTRY_BYTES
+        if name is None:
+            self.sharedMemory = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.sharedMemory = shared_memory.SharedMemory(name=name)
+        self.name = self.sharedMemory.name
+        self.words = self.sharedMemory.buf.cast('Q') # 2 words per entry, 4 per bucket
+        if name is None:
+            self.clear()
+        self.probes = 0
+        self.hits = 0
+
+    def clear(self):
+        """ Empty the table and reset the counters. """
+
+        self.sharedMemory.buf[:] = bytes(len(self.sharedMemory.buf))
+        self.probes = 0
+        self.hits = 0
+
+    def probe(self, key):
+        """ Returns the entry stored for this zobrist key, or None. """
+
+        self.probes += 1
+        words = self.words
+        index = 4 * (key % self.numBuckets)
+        for i in (index, index + 2):
+            data = words[i + 1]
+            if words[i] ^ data == key and data:
+                self.hits += 1
+                return (key, data >> 16 & 0xFF, ((data >> 32) - SCORE_OFFSET) / SCORE_SCALE,
+                        data >> 24 & 0x3, data & 0xFFFF)
+        return None
+
+    def store(self, key, depth, score, flag, bestMoveID):
+        """ Save a search result using the depth-preferred + always-replace scheme. """
+
+        words = self.words
+        index = 4 * (key % self.numBuckets)
+        deepData = words[index + 1]
+        if deepData == 0 or words[index] ^ deepData == key or depth >= (deepData >> 16 & 0xFF):
+            i = index
+        else:
+            i = index + 2
+        data = bestMoveID | min(depth, 0xFF) << 16 | flag << 24 | (round(score * SCORE_SCALE) + SCORE_OFFSET) << 32
+        words[i + 1] = data
+        words[i] = key ^ data
+
+    def usage(self):
+        """ Fraction of the slots in use, sampled on the first entries. Used in the search summary. """
+
+        data = self.words[1:2 * USAGE_SAMPLE:2].tolist() # the data word of each entry, 0 when empty
+        return (len(data) - data.count(0)) / len(data)
+
+    def close(self, unlink=False):
+        """ Detach from the shared memory. The process that created the table also unlinks (frees) it. """
+
+        self.words.release()
+        self.sharedMemory.close()
+        if unlink:
+            self.sharedMemory.unlink()
@@ -1,9 +1,10 @@
 from openpyxl import Workbook
 from openpyxl.styles import PatternFill, Border, Side, Alignment, Protection, Font
 from datetime import date, datetime, timedelta
+import ChessTrace
 
-class searchTree():
-    """ very basic class to hold search and save it to excel. """
+class searchTree(ChessTrace.SearchTracer):
+    """ very basic class to hold search and save it to excel. Installed with ChessAI.setSearchTracer. """
 
     def __init__(self, maxDepth) -> None:
         self.wb = Workbook()
@@ -11,6 +12,19 @@ class searchTree():
         self.ws.title = "SearchTree"
         self.currentRow = 1
         self.maxDepth = maxDepth
+        self.currentBestMove = None # displays the temporary best move across unrelated branches.
+
+    def newSearch(self, gs):
+        self.currentBestMove = None
+
+    def newBestRootMove(self, move):
+        self.currentBestMove = move
+
+    def node(self, depth, moveSeq, score):
+        self.insertData(depth, moveSeq, score, str(self.currentBestMove))
+
+    def searchDone(self, gs):
+        self.saveToExcel("Move#" + str(len(gs.moveLog)// 2 + 1))
 
     def addSheet(self, name):
         """
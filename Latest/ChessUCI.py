@@ -0,0 +1,235 @@
+"""
+UCI (Universal Chess Interface) front-end: runs the engine without the pygame GUI, driven over stdin/stdout
+by a chess GUI, a tournament manager or a script. See https://www.chessprogramming.org/UCI
+
+    python ChessUCI.py                  bitboard move generator
+    python ChessUCI.py --engine list    original 8x8 list generator
+
+Supported: uci, isready, ucinewgame, setoption (Hash, Threads, MultiPV, Ponder),
+position startpos|fen ... [moves ...], go (wtime btime winc binc movestogo movetime depth nodes infinite ponder),
+stop, ponderhit, quit. The search reports info depth/score/nodes/nps/time/pv after each completed iteration.
+The engine only promotes to a queen: an underpromotion received in "position" is played as a queen promotion.
+"""
+
+import argparse
+import queue
+import sys
+import threading
+import time
+from multiprocessing import Value
+import ChessEngine
+import ChessBitboard
+import ChessTranspositionTable as ChessTT
+import ChessAI
+
+ENGINE_NAME = "chess-GUI-Engine"
+MOVES_TO_GO = 30        # Moves left to plan the time for, when the GUI does not say (sudden death)
+MOVE_OVERHEAD = 50      # Milliseconds kept for the communication with the GUI
+
+class UCIEngine():
+    """ Reads the UCI commands and runs each search in a thread, so "stop" and "ponderhit" are seen right away. """
+
+    def __init__(self, gameStateClass) -> None:
+        self.gameStateClass = gameStateClass
+        self.gs = gameStateClass()
+        self.searchThread = None
+        self.release = threading.Event() # set when an infinite or ponder search may send its bestmove
+        self.startTime = 0
+        self.outputLock = threading.Lock()
+        self.defaultTimeLimit = ChessAI.searchTimeLimit
+        self.defaultDepthLimit = ChessAI.maxIterativeDepth
+
+        ChessAI.showSearchSummary = False      # stdout is the UCI channel
+        ChessAI.useIterativeDeepening = True   # needed for the time controls and the info output
+        ChessAI.searchInfo = self.sendInfo
+        if ChessAI.stopSearch is None:
+            ChessAI.stopSearch = Value('b', 0)
+
+    def send(self, text):
+        """ Writes one line to the GUI. The search thread and the command loop both write. """
+
+        with self.outputLock:
+            sys.stdout.write(text + "\n")
+            sys.stdout.flush()
+
+    def run(self):
+        """ Command loop, until "quit" or the end of stdin. """
+
+        for line in sys.stdin:
+            tokens = line.split()
+            if not tokens:
+                continue
+            command, args = tokens[0], tokens[1:]
+            if command == "quit":
+                break
+            elif command == "uci":
+                self.send("id name " + ENGINE_NAME)
+                self.send("id author Pointlessboring")
+                self.send(f"option name Hash type spin default {ChessAI.transpositionTableMB} min 1 max 1024")
+                self.send("option name Threads type spin default 1 min 1 max 64")
+                self.send("option name MultiPV type spin default 1 min 1 max 64")
+                self.send("option name Ponder type check default true")
+                self.send("uciok")
+            elif command == "isready":
+                self.send("readyok")
+            elif command == "setoption":
+                self.setOption(args)
+            elif command == "ucinewgame":
+                self.stop()
+                ChessAI.newGame()
+            elif command == "position":
+                self.stop()
+                self.setPosition(args)
+            elif command == "go":
+                self.stop()
+                self.go(args)
+            elif command == "stop":
+                self.stop()
+            elif command == "ponderhit":
+                ChessAI.ponderHit()
+                self.release.set()
+        self.stop()
+
+    def setOption(self, args):
+        """ setoption name <name> value <value> """
+
+        if "value" not in args:
+            return
+        name = " ".join(args[1:args.index("value")]).lower()
+        value = " ".join(args[args.index("value") + 1:])
+        if name == "hash":
+            ChessAI.transpositionTableMB = int(value)
+            if ChessAI.useTranspositionTable:
+                ChessAI.transpositionTable = ChessTT.TranspositionTable(ChessAI.transpositionTableMB)
+        elif name == "threads":
+            if ChessAI.workerPool is not None: # the pool size is fixed when it is created
+                ChessAI.workerPool.terminate()
+                ChessAI.workerPool = None
+            ChessAI.parallelWorkers = int(value) if int(value) > 1 else 0
+            if ChessAI.parallelWorkers:
+                # Start the workers now: forked from the search thread while this thread waits in a stdin read, 
+                # they would block on the stdin lock when they close their copy of stdin.
+                ChessAI.getWorkerPool()
+        elif name == "multipv":
+            ChessAI.multiPV = max(int(value), 1)
+
+    def setPosition(self, args):
+        """ position startpos|fen <fen> [moves <move> ...] """
+
+        movesIndex = args.index("moves") if "moves" in args else len(args)
+        fen = ChessEngine.START_FEN if args[0] == "startpos" else " ".join(args[1:movesIndex])
+        self.gs = self.gameStateClass.fromFEN(fen)
+        for notation in args[movesIndex + 1:]:
+            moves = {move.getCoordinateNotation(): move for move in self.gs.getValidMoves()}
+            move = moves.get(notation) or moves.get(notation[:4] + 'q') # underpromotions are played as a queen
+            if move is None:
+                self.send("info string illegal move " + notation)
+                break
+            self.gs.makeMove(move)
+
+    def go(self, args):
+        """ Sets the search limits from the go parameters and starts the search thread. """
+
+        params = {}
+        flags = set()
+        i = 0
+        while i < len(args):
+            if args[i] in ("infinite", "ponder"):
+                flags.add(args[i])
+                i += 1
+            elif args[i] == "searchmoves": # not supported, the rest of the line are moves
+                break
+            else:
+                if i + 1 < len(args):
+                    params[args[i]] = int(args[i + 1])
+                i += 2
+
+        timeLimit = timeForMove(params, self.gs.whiteToMove)
+        limited = "depth" in params or "nodes" in params
+        ChessAI.searchTimeLimit = timeLimit if timeLimit is not None else (0 if limited else self.defaultTimeLimit)
+        if "infinite" in flags:
+            ChessAI.searchTimeLimit = 0
+        ChessAI.searchNodeLimit = params.get("nodes", 0)
+        ChessAI.maxIterativeDepth = min(params.get("depth", self.defaultDepthLimit), ChessAI.MAX_PLY - 1)
+        ChessAI.pondering = "ponder" in flags
+
+        ChessAI.stopSearch.value = 0
+        if flags:
+            self.release.clear() # bestmove waits for "stop" (or "ponderhit")
+        else:
+            self.release.set()
+        self.startTime = time.time()
+        self.searchThread = threading.Thread(target=self.search, args=(self.gs,), daemon=True)
+        self.searchThread.start()
+
+    def search(self, gs):
+        """ Search thread: runs ChessAI.findBestMove and sends bestmove (with the expected reply to ponder on). """
+
+        validMoves = gs.getValidMoves()
+        if len(validMoves) == 0:
+            self.release.wait()
+            self.send("bestmove 0000")
+            return
+        returnQueue = queue.Queue()
+        ChessAI.findBestMove(gs, validMoves, returnQueue)
+        bestMove = returnQueue.get()
+        line = ChessAI.bestLine if bestMove is not None else []
+        if bestMove is None: # stopped before the first iteration ended
+            bestMove = validMoves[0]
+        self.release.wait() # an infinite or ponder search that ended early still waits for the GUI
+
+        answer = "bestmove " + bestMove.getCoordinateNotation()
+        if len(line) > 1:
+            answer += " ponder " + line[1].getCoordinateNotation()
+        self.send(answer)
+
+    def stop(self):
+        """ Ends the current search, if any, and waits for its bestmove. """
+
+        if self.searchThread is not None:
+            ChessAI.stopSearch.value = 1
+            ChessAI.pondering = False
+            self.release.set()
+            self.searchThread.join()
+            self.searchThread = None
+
+    def sendInfo(self, depth, lines):
+        """ ChessAI.searchInfo: one info line per best line of the iteration that just completed. """
+
+        elapsed = max(time.time() - self.startTime, 0.001)
+        nodes = ChessAI.nodesSearched
+        for index, (score, line) in enumerate(lines, 1):
+            self.send(f"info depth {depth}" + (f" multipv {index}" if ChessAI.multiPV > 1 else "") +
+                      f" score {formatScore(score)} nodes {nodes} nps {int(nodes / elapsed)}" +
+                      f" time {int(elapsed * 1000)} pv " + " ".join(move.getCoordinateNotation() for move in line))
+
+def timeForMove(params, whiteToMove):
+    """ Seconds to spend on this move from the go parameters, None if they have no time control. """
+
+    if "movetime" in params:
+        return max(params["movetime"] - MOVE_OVERHEAD, 1) / 1000
+    timeLeft = params.get("wtime" if whiteToMove else "btime")
+    if timeLeft is None:
+        return None
+    increment = params.get("winc" if whiteToMove else "binc", 0)
+    budget = timeLeft / params.get("movestogo", MOVES_TO_GO) + increment * 3 / 4
+    return max(min(budget, timeLeft - MOVE_OVERHEAD), 1) / 1000
+
+def formatScore(score):
+    """ UCI score of the side to move: "cp <centipawns>" or "mate <moves>" (negative when getting mated). """
+
+    if abs(score) > ChessAI.CHECKMATE / 2:
+        plies = ChessAI.CHECKMATE - abs(score) # mate scores are CHECKMATE - the ply of the mate, see NegaMax
+        moves = (round(plies) + 1) // 2
+        return f"mate {moves if score > 0 else -moves}"
+    return f"cp {round(score * 100)}"
+
+def main():
+    parser = argparse.ArgumentParser(description="UCI front-end of the engine.")
+    parser.add_argument("--engine", choices=("bitboard", "list"), default="bitboard", help="move generator to use")
+    args = parser.parse_args()
+
+    UCIEngine(ChessEngine.GameState if args.engine == "list" else ChessBitboard.BitboardGameState).run()
+
+if __name__ == "__main__":
+    main()
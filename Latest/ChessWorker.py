@@ -0,0 +1,203 @@
+"""
+Long-lived AI worker process. The GUI used to start a new Process for every AI move and terminate() it on undo,
+paying the process startup and the pickling of the whole GameState each time, and losing the transposition table.
+The worker keeps running for the whole session and gets commands over a Pipe:
+    ("go", searchID, gameStateClass, startFEN, moveIDs, ponder)
+                        search the position reached by the moves from startFEN. With ponder, the last move is
+                        the expected opponent move and the search has no time limit until "ponderhit"
+    ("ponderhit",)      the opponent played the expected move: the ponder search continues as a normal search
+    ("stop",)           end the current search early (cooperative, see below)
+    ("newgame",)        clear the transposition table, killers and history
+    ("quit",)           exit the process
+and answers ("bestmove", searchID, moveID, ponderMoveID) after each "go". moveID is None if no move was found,
+ponderMoveID is the expected reply to moveID (second move of the best line) or None.
+
+A reader thread receives the commands while the search runs, so "stop" and "ponderhit" are seen right away: 
+"stop" sets ChessAI.stopSearch and the search ends at its next limits check, returning its last completed iteration.
+
+Pondering: while the human thinks, the worker searches the position after the reply it expects (see ponder()). 
+If the human plays it, the search already has a head start and the transposition table is full of the right 
+positions. If not, the ponder search is stopped and a normal one is started.
+"""
+
+import queue
+import threading
+from multiprocessing import Process, Pipe, Value
+import ChessAI
+import ChessTrace
+
+class EngineWorker():
+    """ GUI side of the worker: starts the process and sends it commands. """
+
+    def __init__(self, exportSearchTree=False) -> None:
+        self.connection, workerConnection = Pipe()
+        self.process = Process(target=workerMain, args=(workerConnection, exportSearchTree))
+        self.process.start()
+        self.searchID = 0   # answers of searches that were stopped or abandoned are ignored
+        self.thinking = False
+        self.pondering = False
+        self.ponderMoveID = None # expected reply to the last move found, see ponder()
+        self.ponderedMoveID = None # the expected reply the current ponder search was started with
+        self.heldAnswer = None   # (moveID,) of a search that ended, kept until the ponder hit for a ponder search
+
+    def go(self, gs, ponder=False):
+        """ Starts a search of the current position of gs. The answer is picked up by poll(). """
+
+        self.searchID += 1
+        self.thinking = True
+        self.pondering = ponder
+        self.heldAnswer = None
+        self.connection.send(("go", self.searchID, type(gs), gs.startFEN, [move.moveID for move in gs.moveLog],
+                              ponder))
+
+    def ponder(self, gs, validMoves):
+        """ 
+        Starts searching, on the opponent's time, the position after the reply expected to the last move found.
+        validMoves are the opponent's moves in gs. Returns False if there is no expected reply.
+        """
+
+        ponderMove = next((move for move in validMoves if move.moveID == self.ponderMoveID), None)
+        if ponderMove is None:
+            return False
+        gs.makeMove(ponderMove)
+        self.go(gs, ponder=True)
+        gs.undoMove()
+        self.ponderedMoveID = ponderMove.moveID
+        return True
+
+    def opponentMoved(self, move):
+        """ 
+        Call when the opponent moves while pondering. Returns True if it was the expected move: the ponder
+        search continues as the search of the reply and poll() gives its answer. Otherwise the ponder search
+        is stopped and False is returned: call go().
+        """
+
+        if not self.pondering:
+            return False
+        if move.moveID == self.ponderedMoveID:
+            self.connection.send(("ponderhit",))
+            self.pondering = False
+            return True
+        self.stop()
+        return False
+
+    def poll(self):
+        """
+        Non-blocking. Returns (True, moveID) when the current search is done (moveID may be None),
+        (False, None) while it is still thinking. A ponder search is not done before ponderHit().
+        """
+
+        while self.connection.poll():
+            answer, searchID, moveID, ponderMoveID = self.connection.recv()
+            if answer == "bestmove" and searchID == self.searchID:
+                self.heldAnswer = (moveID,)
+                self.ponderMoveID = ponderMoveID
+                self.thinking = False
+        if self.heldAnswer is not None and not self.pondering:
+            moveID, = self.heldAnswer
+            self.heldAnswer = None
+            return True, moveID
+        return False, None
+
+    def stop(self):
+        """ Ends the current search (or ponder search). Its answer will be ignored: call go() again for a new one. """
+
+        if self.thinking:
+            self.connection.send(("stop",))
+            self.searchID += 1
+            self.thinking = False
+        self.pondering = False
+        self.heldAnswer = None
+        self.ponderMoveID = None # the position changed, the expected reply may not apply any more
+
+    def newGame(self):
+        """ Stop thinking and forget the previous game. """
+
+        self.stop()
+        self.connection.send(("newgame",))
+
+    def close(self):
+        """ Asks the worker to exit, and terminates it if it does not. """
+
+        self.stop()
+        self.connection.send(("quit",))
+        self.process.join(timeout=2)
+        if self.process.is_alive():
+            self.process.terminate()
+
+def workerMain(connection, exportSearchTree):
+    """ 
+    Runs in the worker process: executes the commands one at a time until "quit".
+    With exportSearchTree every search is saved to an Excel file (see ChessTrace.excelTracer).
+    """
+
+    if exportSearchTree:
+        ChessAI.setSearchTracer(ChessTrace.excelTracer(ChessAI.MAXDEPTH))
+    commands = queue.Queue()
+    if ChessAI.stopSearch is None:
+        ChessAI.stopSearch = Value('b', 0)
+    reader = threading.Thread(target=readCommands, args=(connection, commands), daemon=True)
+    reader.start()
+
+    while True:
+        command = commands.get()
+        if command[0] == "quit":
+            break
+        elif command[0] == "newgame":
+            ChessAI.newGame()
+        elif command[0] == "go":
+            searchID, gameStateClass, startFEN, moveIDs = command[1:5]
+            ChessAI.stopSearch.value = 0
+            moveID = searchPosition(gameStateClass, startFEN, moveIDs)
+            bestLine = ChessAI.bestLine if moveID is not None else []
+            connection.send(("bestmove", searchID, moveID, bestLine[1].moveID if len(bestLine) > 1 else None))
+
+def readCommands(connection, commands):
+    """ 
+    Reader thread: "stop" and "ponderhit" are handled immediately, the other commands are queued for the worker loop.
+    ChessAI.pondering is also set here when a "go" arrives, so a "ponderhit" that follows it is never lost, 
+    even if the search has not started yet.
+    """
+
+    while True:
+        try:
+            command = connection.recv()
+        except EOFError: # the GUI is gone
+            command = ("quit",)
+        if command[0] == "stop":
+            ChessAI.stopSearch.value = 1 # may be the pool's flag (see ChessAI.getWorkerPool): it stops the helpers too
+            discardSearches(commands)
+        elif command[0] == "ponderhit":
+            ChessAI.ponderHit()
+        else:
+            if command[0] == "go":
+                ChessAI.pondering = command[5]
+            commands.put(command)
+        if command[0] == "quit":
+            break
+
+def discardSearches(commands):
+    """ Removes the "go" commands that were queued but not started: they were stopped too. """
+
+    kept = []
+    while not commands.empty():
+        command = commands.get_nowait()
+        if command[0] != "go":
+            kept.append(command)
+    for command in kept:
+        commands.put(command)
+
+def searchPosition(gameStateClass, startFEN, moveIDs):
+    """ Replays the game and runs ChessAI.findBestMove. Returns the moveID of the best move, or None. """
+
+    gs = gameStateClass.fromFEN(startFEN)
+    for moveID in moveIDs:
+        gs.makeMove(next(move for move in gs.getValidMoves() if move.moveID == moveID))
+    validMoves = gs.getValidMoves()
+    if len(validMoves) == 0:
+        return None
+
+    returnQueue = queue.Queue()
+    ChessAI.findBestMove(gs, validMoves, returnQueue)
+    bestMove = returnQueue.get()
+    return bestMove.moveID if bestMove is not None else None